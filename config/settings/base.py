@@ -3,6 +3,7 @@ Base settings to build other settings files upon.
 """
 import os
 import environ
+from celery.schedules import crontab
 
 ROOT_DIR = (
     environ.Path(__file__) - 3
@@ -84,6 +85,7 @@ THIRD_PARTY_APPS = [
 LOCAL_APPS = [
     # "simplifytour.blogs",
     # "simplifytour.boot",
+    "simplifytour.bookings",
     "simplifytour.conf",
     "simplifytour.core",
     "simplifytour.generic",
@@ -281,6 +283,21 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# http://docs.celeryproject.org/en/latest/userguide/periodic-tasks.html#beat-entries
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-ratings": {
+        "task": "simplifytour.generic.tasks.reconcile_ratings",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "generate-sitemaps": {
+        "task": "simplifytour.core.tasks.generate_sitemaps",
+        "schedule": crontab(minute=0),
+    },
+    "expire-booking-holds": {
+        "task": "simplifytour.bookings.tasks.expire_holds",
+        "schedule": crontab(),
+    },
+}
 # django-allauth
 # ------------------------------------------------------------------------------
 ACCOUNT_ALLOW_REGISTRATION = env.bool(
@@ -343,6 +360,8 @@ BLOG_RSS_LIMIT = '20'
 BLOG_SLUG = 'blog'
 BLOG_URLS_DATE_FORMAT = ''
 UPLOAD_TO_HANDLERS = {}
+# Most bytes a single multipart GraphQL request may upload.
+GRAPHQL_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
 JQUERY_UI_FILENAME = 'jquery-ui-1.8.24.min.js'
 
 ADD_PAGE_ORDER = ''
@@ -369,7 +388,106 @@ RICHTEXT_ALLOWED_TAGS = ('a', 'abbr', 'acronym', 'address', 'area', 'article', '
                          'textarea', 'tfoot', 'th', 'thead', 'tr', 'tt', '', 'ul', 'var', 'wbr')
 RICHTEXT_FILTERS = ('simplifytour.utils.html.thumbnails',)
 
+# Seconds that seats held by ``Booking.objects.hold`` stay held unless
+# the booking is confirmed.
+BOOKING_HOLD_TIMEOUT = 15 * 60
 PACKAGES_ROOT = "packages"
+PACKAGES_PUBLISHED_INCLUDE_LOGIN_REQUIRED = False
+# Upper bound in seconds on how long the page menu tree is cached for.
+# Saving, deleting or reordering a page rebuilds it straight away.
+PAGE_MENU_CACHE_TIMEOUT = 60 * 60
+# Threads used to validate and upload images from an article's zip import.
+GALLERY_IMPORT_WORKERS = 4
+GALLERY_IMPORT_PROGRESS_TIMEOUT = 24 * 60 * 60
+# Seconds before an article's zip import that hasn't finished can be queued again.
+GALLERY_IMPORT_QUEUE_TIMEOUT = 60 * 60
+# Recalculate keyword strings, comment counts and rating totals in a
+# Celery task once the transaction that changed them commits.
+GENERIC_RELATIONS_ASYNC = False
+# Seconds that editable settings read outside of a request (eg in Celery
+# tasks and management commands) are used before their version in the
+# shared cache is checked again.
+SETTINGS_SNAPSHOT_MAX_AGE = 5
+
+# Sitemap files written by ``simplifytour.core.tasks.generate_sitemaps``
+# to default storage. 50,000 URLs is the most a single file may list.
+SITEMAP_DIR_NAME = 'sitemaps'
+SITEMAP_PAGE_SIZE = 50000
+SITEMAP_CHUNK_SIZE = 2000
+SITEMAP_PROTOCOL = 'https'
+# Path of a package's page on the frontend, used for its sitemap entry.
+PACKAGE_URL_FORMAT = '/packages/%(slug)s/'
+
+THUMBNAILS_DIR_NAME = '.thumbnails'
+# Generate thumbnails with a Celery task rather than while rendering
+# the ``thumbnail`` template tag, which serves the original image until
+# the thumbnail exists.
+THUMBNAILS_ASYNC = False
+# Seconds before a queued thumbnail that hasn't been generated is queued again.
+THUMBNAILS_QUEUE_TIMEOUT = 10 * 60
+# Seconds that generated thumbnails are remembered for, without checking
+# storage, by the ``thumbnail`` template tag. None remembers them forever.
+THUMBNAILS_MANIFEST_TIMEOUT = 7 * 24 * 60 * 60
+
+SEARCH_MODEL_CHOICES = ()
+SEARCH_PER_PAGE = 10
+SEARCH_AGE_SCALE_FACTOR = 1.5
+# Dotted path to the search backend used by ``SearchableQuerySet``. When
+# empty, the backend is picked from the database vendor (see
+# ``simplifytour.core.search.get_search_backend``).
+SEARCH_BACKEND = ''
+SEARCH_POSTGRES_CONFIG = 'english'
+STOP_WORDS = (
+    "a", "about", "above", "above", "across", "after",
+    "afterwards", "again", "against", "all", "almost", "alone",
+    "along", "already", "also", "although", "always", "am",
+    "among", "amongst", "amoungst", "amount", "an", "and",
+    "another", "any", "anyhow", "anyone", "anything", "anyway",
+    "anywhere", "are", "around", "as", "at", "back", "be",
+    "became", "because", "become", "becomes", "becoming", "been",
+    "before", "beforehand", "behind", "being", "below", "beside",
+    "besides", "between", "beyond", "bill", "both", "bottom",
+    "but", "by", "call", "can", "cannot", "cant", "co", "con",
+    "could", "couldnt", "cry", "de", "describe", "detail", "do",
+    "done", "down", "due", "during", "each", "eg", "eight",
+    "either", "eleven", "else", "elsewhere", "empty", "enough",
+    "etc", "even", "ever", "every", "everyone", "everything",
+    "everywhere", "except", "few", "fifteen", "fifty", "fill",
+    "find", "fire", "first", "five", "for", "former", "formerly",
+    "forty", "found", "four", "from", "front", "full", "further",
+    "get", "give", "go", "had", "has", "hasnt", "have", "he",
+    "hence", "her", "here", "hereafter", "hereby", "herein",
+    "hereupon", "hers", "herself", "him", "himself", "his",
+    "how", "however", "hundred", "ie", "if", "in", "inc",
+    "indeed", "interest", "into", "is", "it", "its", "itself",
+    "keep", "last", "latter", "latterly", "least", "less", "ltd",
+    "made", "many", "may", "me", "meanwhile", "might", "mill",
+    "mine", "more", "moreover", "most", "mostly", "move", "much",
+    "must", "my", "myself", "name", "namely", "neither", "never",
+    "nevertheless", "next", "nine", "no", "nobody", "none",
+    "noone", "nor", "not", "nothing", "now", "nowhere", "of",
+    "off", "often", "on", "once", "one", "only", "onto", "or",
+    "other", "others", "otherwise", "our", "ours", "ourselves",
+    "out", "over", "own", "part", "per", "perhaps", "please",
+    "put", "rather", "re", "same", "see", "seem", "seemed",
+    "seeming", "seems", "serious", "several", "she", "should",
+    "show", "side", "since", "sincere", "six", "sixty", "so",
+    "some", "somehow", "someone", "something", "sometime",
+    "sometimes", "somewhere", "still", "such", "system", "take",
+    "ten", "than", "that", "the", "their", "them", "themselves",
+    "then", "thence", "there", "thereafter", "thereby",
+    "therefore", "therein", "thereupon", "these", "they",
+    "thickv", "thin", "third", "this", "those", "though",
+    "three", "through", "throughout", "thru", "thus", "to",
+    "together", "too", "top", "toward", "towards", "twelve",
+    "twenty", "two", "un", "under", "until", "up", "upon", "us",
+    "very", "via", "was", "we", "well", "were", "what", "whatever",
+    "when", "whence", "whenever", "where", "whereafter", "whereas",
+    "whereby", "wherein", "whereupon", "wherever", "whether",
+    "which", "while", "whither", "who", "whoever", "whole", "whom",
+    "whose", "why", "will", "with", "within", "without", "would",
+    "yet", "you", "your", "yours", "yourself", "yourselves", "the",
+)
 
 try:
     from simplifytour.utils.conf import set_dynamic_settings
@@ -6,10 +6,13 @@ from django.contrib import admin
 from django.conf import settings
 
 from simplifytour.core.file_upload.views import FileUploadGraphQLView
+from simplifytour.core.views import sitemap
 from simplifytour.graphapi.api import schema
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('sitemap.xml', sitemap, name='sitemap'),
+    path('sitemap-<int:section>.xml', sitemap, name='sitemap_section'),
     path('graphql', jwt_cookie(csrf_exempt(FileUploadGraphQLView.as_view(schema=schema, graphiql=settings.DEBUG)))),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -1,3 +1,30 @@
 from django.contrib import admin
 
-# Register your models here.
+from simplifytour.bookings.models import Booking, GuideDay, Inventory, PorterDay
+
+
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ('departure', 'user', 'seats', 'porters', 'guide', 'status',
+                    'expires_at', 'confirmed_at')
+    list_filter = ('status',)
+    raw_id_fields = ('departure', 'user')
+    # Seats are only given back through ``Booking.cancel`` and expiry.
+    readonly_fields = ('status', 'expires_at', 'confirmed_at')
+
+
+class InventoryAdmin(admin.ModelAdmin):
+    list_display = ('departure', 'seats_taken', 'capacity')
+    raw_id_fields = ('departure',)
+    readonly_fields = ('seats_taken', 'capacity')
+
+
+class StaffDayAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'date', 'allocated')
+    date_hierarchy = 'date'
+    readonly_fields = ('allocated',)
+
+
+admin.site.register(Booking, BookingAdmin)
+admin.site.register(Inventory, InventoryAdmin)
+admin.site.register(PorterDay, StaffDayAdmin)
+admin.site.register(GuideDay, StaffDayAdmin)
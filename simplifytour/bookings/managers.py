@@ -0,0 +1,172 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Manager, Q
+from django.utils.timezone import now
+
+from simplifytour.packages.models import Porter
+
+
+class InventoryManager(Manager):
+
+    def for_departure(self, departure):
+        """
+        The inventory row for ``departure``, created on first use.
+        """
+        inventory, created = self.get_or_create(
+            departure_id=departure.pk,
+            defaults={"capacity": departure.max_group_size
+                      if departure.is_active else 0})
+        return inventory
+
+    def take(self, departure, seats):
+        """
+        Takes ``seats`` on ``departure`` if they're free, with a
+        single conditional ``UPDATE``. The check only reads columns of
+        the row being updated, so the database re-evaluates it against
+        the latest committed row after waiting on a concurrent
+        booker's lock, and the departure can't be oversold. Returns
+        ``True`` if the seats were taken.
+        """
+        inventory = self.for_departure(departure)
+        taken = self.filter(
+            pk=inventory.pk, capacity__gte=F("seats_taken") + seats,
+        ).update(seats_taken=F("seats_taken") + seats)
+        return bool(taken)
+
+    def give_back(self, seats_by_departure):
+        """
+        Returns seats to their departures, given a dict of departure
+        id to number of seats.
+        """
+        for departure_id, seats in seats_by_departure.items():
+            self.filter(departure_id=departure_id).update(
+                seats_taken=F("seats_taken") - seats)
+
+
+class StaffDayManager(Manager):
+    """
+    Per-day allocation counters for a kind of staff, the model's
+    ``staff_field`` (``porter`` or ``guide``).
+    """
+
+    def allocate(self, staff_id, dates, count, capacity=0):
+        """
+        Allocates ``count`` staff on each of ``dates``, if every day
+        has room under ``capacity`` (0 is unlimited). Missing counters
+        are created first, then a single conditional ``UPDATE``
+        increments every day that has room, so concurrent allocations
+        can't exceed the capacity. Returns ``False`` if any day is
+        full, in which case the caller's transaction must be rolled
+        back to undo the days that were incremented.
+        """
+        if not dates:
+            return True
+        field = self.model.staff_field
+        self.bulk_create([self.model(**{"%s_id" % field: staff_id, "date": d})
+                          for d in dates], ignore_conflicts=True)
+        days = self.filter(**{"%s_id" % field: staff_id, "date__in": dates})
+        if capacity:
+            days = days.filter(allocated__lte=capacity - count)
+        return days.update(allocated=F("allocated") + count) == len(dates)
+
+    def release(self, staff_id, dates, count):
+        """
+        Gives back ``count`` staff allocated on each of ``dates``.
+        """
+        if dates and count:
+            field = self.model.staff_field
+            self.filter(**{"%s_id" % field: staff_id, "date__in": dates}).update(
+                allocated=F("allocated") - count)
+
+
+class BookingManager(Manager):
+
+    def hold(self, departure, seats, user=None, porter=None, guide=None):
+        """
+        Holds ``seats`` on ``departure`` for ``BOOKING_HOLD_TIMEOUT``
+        seconds, until the booking is confirmed or the hold expires,
+        along with the porters and guide the package needs (see
+        ``simplifytour.bookings.staffing``). If the departure is full,
+        expired holds on it are released and the hold is tried once
+        more before ``SeatsUnavailable`` is raised. ``StaffUnavailable``
+        is raised if the porters or guide are already allocated.
+        """
+        from simplifytour.bookings.models import (
+            GuideDay, Inventory, PorterDay, SeatsUnavailable,
+            StaffUnavailable)
+        from simplifytour.bookings.staffing import staffing
+        if seats < 1:
+            raise ValueError("A booking must hold at least one seat")
+        need = staffing([(departure, seats, getattr(porter, "pk", None),
+                          getattr(guide, "pk", None))])[0]
+        capacity = 0
+        if need.porter_id:
+            capacity = porter.count if porter else Porter.objects.filter(
+                pk=need.porter_id).values_list("count", flat=True)[0]
+        for attempt in range(2):
+            with transaction.atomic(using=self.db):
+                if Inventory.objects.take(departure, seats):
+                    if not (PorterDay.objects.allocate(
+                                need.porter_id, need.porter_dates,
+                                need.porters, capacity) and
+                            GuideDay.objects.allocate(
+                                need.guide_id, need.guide_dates, 1, 1)):
+                        raise StaffUnavailable(departure)
+                    expires = now() + timedelta(
+                        seconds=settings.BOOKING_HOLD_TIMEOUT)
+                    return self.create(
+                        departure=departure, seats=seats, user=user,
+                        porter_id=need.porter_id, porters=need.porters,
+                        porter_days=len(need.porter_dates),
+                        guide_id=need.guide_id,
+                        guide_days=len(need.guide_dates),
+                        status=self.model.HELD, expires_at=expires)
+            if not attempt and not self.expire(departure=departure):
+                break
+        raise SeatsUnavailable(departure, seats)
+
+    def release(self, bookings, status):
+        """
+        Moves the given held or confirmed bookings to ``status`` and
+        gives their seats back. Each booking changes status with a
+        conditional ``UPDATE``, so a booking being confirmed or
+        released concurrently only has its seats given back once.
+        Returns the number of bookings released.
+        """
+        from simplifytour.bookings.models import GuideDay, Inventory, PorterDay
+        from simplifytour.bookings.staffing import staff_dates
+        active = (self.model.HELD, self.model.CONFIRMED)
+        seats = {}
+        released = 0
+        with transaction.atomic(using=self.db):
+            for booking in bookings:
+                lookup = Q(status__in=active)
+                if status == self.model.EXPIRED:
+                    lookup = Q(status=self.model.HELD, expires_at__lte=now())
+                if self.filter(lookup, pk=booking.pk).update(
+                        status=status, updated=now()):
+                    seats.setdefault(booking.departure_id, 0)
+                    seats[booking.departure_id] += booking.seats
+                    PorterDay.objects.release(
+                        booking.porter_id, staff_dates(booking.departure.date,
+                                                       booking.porter_days),
+                        booking.porters)
+                    GuideDay.objects.release(
+                        booking.guide_id, staff_dates(booking.departure.date,
+                                                      booking.guide_days), 1)
+                    released += 1
+            Inventory.objects.give_back(seats)
+        return released
+
+    def expire(self, **lookup):
+        """
+        Releases holds past their expiry, optionally filtered by
+        ``lookup``. Run every minute by
+        ``simplifytour.bookings.tasks.expire_holds``.
+        """
+        expired = self.filter(status=self.model.HELD, expires_at__lte=now(),
+                              **lookup)
+        return self.release(expired.select_related("departure"),
+                            self.model.EXPIRED)
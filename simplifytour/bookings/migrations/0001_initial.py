@@ -0,0 +1,56 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('packages', '0006_departure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Inventory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats_taken', models.PositiveSmallIntegerField(default=0)),
+                ('departure', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='packages.Departure')),
+            ],
+            options={
+                'verbose_name': 'Inventory',
+                'verbose_name_plural': 'Inventories',
+            },
+        ),
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, null=True)),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('seats', models.PositiveSmallIntegerField(verbose_name='Seats')),
+                ('porters', models.PositiveSmallIntegerField(default=0, verbose_name='Porters')),
+                ('status', models.IntegerField(choices=[(1, 'Held'), (2, 'Confirmed'), (3, 'Cancelled'), (4, 'Expired')], default=1, verbose_name='Status')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Hold expires at')),
+                ('confirmed_at', models.DateTimeField(blank=True, null=True, verbose_name='Confirmed at')),
+                ('departure', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='packages.Departure')),
+                ('guide', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='packages.Guide')),
+                ('porter', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='packages.Porter')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Booking',
+                'verbose_name_plural': 'Bookings',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'expires_at'], name='bookings_bo_status_86acff_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0006_departure'),
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='guide_days',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Guide days'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='porter_days',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Porter days'),
+        ),
+        migrations.CreateModel(
+            name='PorterDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('allocated', models.PositiveIntegerField(default=0)),
+                ('porter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='packages.Porter')),
+            ],
+            options={
+                'verbose_name': 'Porter day',
+                'verbose_name_plural': 'Porter days',
+                'unique_together': {('porter', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GuideDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('allocated', models.PositiveIntegerField(default=0)),
+                ('guide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='packages.Guide')),
+            ],
+            options={
+                'verbose_name': 'Guide day',
+                'verbose_name_plural': 'Guide days',
+                'unique_together': {('guide', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_capacity(apps, schema_editor):
+    """
+    Copy each departure's ``max_group_size`` to its inventory.
+    """
+    Inventory = apps.get_model("bookings", "Inventory")
+    Departure = apps.get_model("packages", "Departure")
+    max_group_size = Departure.objects.filter(
+        pk=OuterRef("departure_id")).values("max_group_size")
+    Inventory.objects.using(schema_editor.connection.alias).update(
+        capacity=Subquery(max_group_size))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_staff_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='capacity',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_capacity, migrations.RunPython.noop),
+    ]
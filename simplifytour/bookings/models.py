@@ -1,3 +1,204 @@
+from django.conf import settings
 from django.db import models
+from django.dispatch import receiver
+from django.utils.timezone import now
+from django.utils.translation import ugettext, ugettext_lazy as _
 
-# Create your models here.
+from simplifytour.core.models import TimeStamped
+from simplifytour.packages.signals import departures_synced
+from .managers import BookingManager, InventoryManager, StaffDayManager
+
+
+class BookingError(Exception):
+    """
+    Base class for errors raised when a booking can't be made.
+    """
+
+
+class SeatsUnavailable(BookingError):
+    """
+    Raised by ``Booking.objects.hold`` when the departure doesn't have
+    enough free seats.
+    """
+
+    def __init__(self, departure, seats):
+        self.departure = departure
+        self.seats = seats
+
+    def __str__(self):
+        return ugettext("%(seats)s seats are not available on %(date)s") % {
+            "seats": self.seats, "date": self.departure.date}
+
+
+class StaffUnavailable(BookingError):
+    """
+    Raised by ``Booking.objects.hold`` when the porters or guide the
+    departure needs are already allocated on one of its days.
+    """
+
+    def __init__(self, departure):
+        self.departure = departure
+
+    def __str__(self):
+        return ugettext("Staff are not available for %(date)s") % {
+            "date": self.departure.date}
+
+
+class HoldExpired(BookingError):
+    """
+    Raised by ``Booking.confirm`` when the booking is no longer held.
+    """
+
+    def __str__(self):
+        return ugettext("The booking is no longer held")
+
+
+class Inventory(models.Model):
+    """
+    Seats taken on a departure by held and confirmed bookings, out of
+    ``capacity``, which is copied from the departure's
+    ``max_group_size`` so seats can be taken with an ``UPDATE`` of
+    this row alone.
+    """
+    departure = models.OneToOneField('packages.Departure', related_name='inventory',
+                                     on_delete=models.CASCADE)
+    seats_taken = models.PositiveSmallIntegerField(default=0)
+    capacity = models.PositiveSmallIntegerField(default=0)
+
+    objects = InventoryManager()
+
+    def __str__(self):
+        return "{} [{}/{}]".format(self.departure, self.seats_taken,
+                                   self.capacity)
+
+    class Meta:
+        verbose_name = _("Inventory")
+        verbose_name_plural = _("Inventories")
+
+
+@receiver(departures_synced)
+def update_capacity(sender, price, **kwargs):
+    """
+    Keep the capacity of the price's departures in line with its
+    ``max_group_size``. Inactive departures take no more bookings.
+    """
+    inventories = Inventory.objects.filter(departure__price=price)
+    inventories.filter(departure__is_active=True).update(
+        capacity=price.max_group_size)
+    inventories.filter(departure__is_active=False).update(capacity=0)
+
+
+class PorterDay(models.Model):
+    """
+    Porters allocated from a ``Porter`` on a day, out of
+    ``Porter.count``.
+    """
+    staff_field = "porter"
+
+    porter = models.ForeignKey('packages.Porter', related_name='days', on_delete=models.CASCADE)
+    date = models.DateField(_("Date"))
+    allocated = models.PositiveIntegerField(default=0)
+
+    objects = StaffDayManager()
+
+    def __str__(self):
+        return "{} [{}: {}]".format(self.porter, self.date, self.allocated)
+
+    class Meta:
+        verbose_name = _("Porter day")
+        verbose_name_plural = _("Porter days")
+        unique_together = ('porter', 'date')
+
+
+class GuideDay(models.Model):
+    """
+    Groups a ``Guide`` is allocated to on a day, which is at most one.
+    """
+    staff_field = "guide"
+
+    guide = models.ForeignKey('packages.Guide', related_name='days', on_delete=models.CASCADE)
+    date = models.DateField(_("Date"))
+    allocated = models.PositiveIntegerField(default=0)
+
+    objects = StaffDayManager()
+
+    def __str__(self):
+        return "{} [{}: {}]".format(self.guide, self.date, self.allocated)
+
+    class Meta:
+        verbose_name = _("Guide day")
+        verbose_name_plural = _("Guide days")
+        unique_together = ('guide', 'date')
+
+
+class Booking(TimeStamped):
+    """
+    Seats on a departure, held for ``BOOKING_HOLD_TIMEOUT`` seconds
+    by ``Booking.objects.hold`` until confirmed, along with the
+    porters and guide allocated to it for ``porter_days`` and
+    ``guide_days`` days from the departure.
+    """
+    HELD = 1
+    CONFIRMED = 2
+    CANCELLED = 3
+    EXPIRED = 4
+    STATUS_CHOICES = (
+        (HELD, _("Held")),
+        (CONFIRMED, _("Confirmed")),
+        (CANCELLED, _("Cancelled")),
+        (EXPIRED, _("Expired")),
+    )
+
+    departure = models.ForeignKey('packages.Departure', related_name='bookings',
+                                   on_delete=models.PROTECT)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='bookings', null=True,
+                             blank=True, on_delete=models.SET_NULL)
+    seats = models.PositiveSmallIntegerField(_("Seats"))
+    porter = models.ForeignKey('packages.Porter', related_name='bookings', null=True,
+                               blank=True, on_delete=models.PROTECT)
+    porters = models.PositiveSmallIntegerField(_("Porters"), default=0)
+    porter_days = models.PositiveSmallIntegerField(_("Porter days"), default=0)
+    guide = models.ForeignKey('packages.Guide', related_name='bookings', null=True,
+                              blank=True, on_delete=models.PROTECT)
+    guide_days = models.PositiveSmallIntegerField(_("Guide days"), default=0)
+    status = models.IntegerField(_("Status"), choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField(_("Hold expires at"), null=True, blank=True)
+    confirmed_at = models.DateTimeField(_("Confirmed at"), null=True, blank=True)
+
+    objects = BookingManager()
+
+    def __str__(self):
+        return "{} x {}".format(self.departure, self.seats)
+
+    class Meta:
+        verbose_name = _("Booking")
+        verbose_name_plural = _("Bookings")
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def confirm(self):
+        """
+        Confirms the held booking. The status check and change are a
+        single conditional ``UPDATE``, so a hold that expires or is
+        released concurrently can't also be confirmed.
+        """
+        _now = now()
+        confirmed = Booking.objects.filter(
+            pk=self.pk, status=self.HELD, expires_at__gt=_now,
+        ).update(status=self.CONFIRMED, confirmed_at=_now, updated=_now)
+        if not confirmed:
+            raise HoldExpired()
+        self.status = self.CONFIRMED
+        self.confirmed_at = self.updated = _now
+
+    def cancel(self):
+        """
+        Cancels the booking and gives its seats and staff back. Returns
+        ``False`` if it was already cancelled or expired.
+        """
+        if not Booking.objects.release([self], self.CANCELLED):
+            return False
+        self.status = self.CANCELLED
+        return True
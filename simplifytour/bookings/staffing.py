@@ -0,0 +1,108 @@
+from collections import namedtuple
+from datetime import timedelta
+from math import ceil
+
+from simplifytour.packages.models import Package, Porter
+
+
+Staffing = namedtuple("Staffing", ("porter_id", "porters", "porter_dates",
+                                   "guide_id", "guide_dates"))
+
+
+def staff_dates(start, days):
+    """
+    The dates staff are away for, from ``start`` for ``days`` days.
+    """
+    return [start + timedelta(days=i) for i in range(max(days or 0, 0))]
+
+
+def staffing(requests):
+    """
+    The staff needed for each of ``requests``, a sequence of
+    ``(departure, seats)`` or ``(departure, seats, porter_id,
+    guide_id)`` tuples, where the porter and guide default to the
+    package's ``default_porter`` and ``default_guide``. A package that
+    requires porters needs one per ``Porter.ratio`` travellers for
+    ``porter_days`` days from the departure, and one that requires a
+    guide needs them for ``guide_days`` days. Packages and porters
+    are loaded in two queries for all the requests.
+    """
+    requests = [tuple(request) + (None,) * (4 - len(request))
+                for request in requests]
+    package_ids = set(request[0].package_id for request in requests)
+    packages = Package.objects.filter(pk__in=package_ids).with_summary()
+    packages = dict((package["id"], package) for package in packages.values(
+        "id", "porter_required", "porter_days", "summary_porter_id",
+        "guide_required", "guide_days", "summary_guide_id"))
+    porter_ids = set(request[2] for request in requests)
+    porter_ids |= set(p["summary_porter_id"] for p in packages.values())
+    ratios = dict(Porter.objects.filter(id__in=porter_ids - {None})
+                  .values_list("id", "ratio"))
+
+    needs = []
+    for departure, seats, porter_id, guide_id in requests:
+        package = packages.get(departure.package_id)
+        if package is None:
+            needs.append(Staffing(None, 0, [], None, []))
+            continue
+        porter_id = porter_id or package["summary_porter_id"]
+        porters, porter_dates = 0, []
+        if package["porter_required"] and porter_id:
+            porters = int(ceil(seats / float(ratios.get(porter_id) or 1)))
+            porter_dates = staff_dates(departure.date, package["porter_days"])
+        guide_id = guide_id or package["summary_guide_id"]
+        guide_dates = []
+        if package["guide_required"] and guide_id:
+            guide_dates = staff_dates(departure.date, package["guide_days"])
+        needs.append(Staffing(porter_id if porter_dates else None, porters,
+                              porter_dates, guide_id if guide_dates else None,
+                              guide_dates))
+    return needs
+
+
+def can_staff(requests):
+    """
+    Answers whether each of ``requests`` (as for ``staffing``) can be
+    staffed, in order, with each request that fits counting against
+    the ones after it. Reads the ``PorterDay`` and ``GuideDay``
+    counters for the dates involved in one query each, rather than
+    scanning bookings. ``Porter.count`` porters are available a day,
+    or any number if it's 0, and each guide can lead one group a day.
+    Returns a list of booleans.
+    """
+    from simplifytour.bookings.models import GuideDay, PorterDay
+    needs = staffing(requests)
+    dates = [d for need in needs for d in need.porter_dates + need.guide_dates]
+    if not dates:
+        return [True] * len(needs)
+    period = (min(dates), max(dates))
+    porter_ids = set(need.porter_id for need in needs) - {None}
+    guide_ids = set(need.guide_id for need in needs) - {None}
+    capacity = dict(Porter.objects.filter(id__in=porter_ids)
+                    .values_list("id", "count"))
+    porter_allocated = dict(
+        ((porter_id, date), allocated) for porter_id, date, allocated in
+        PorterDay.objects.filter(porter_id__in=porter_ids, date__range=period)
+        .values_list("porter_id", "date", "allocated"))
+    guide_allocated = dict(
+        ((guide_id, date), allocated) for guide_id, date, allocated in
+        GuideDay.objects.filter(guide_id__in=guide_ids, date__range=period)
+        .values_list("guide_id", "date", "allocated"))
+
+    results = []
+    for need in needs:
+        count = capacity.get(need.porter_id)
+        porter_keys = [(need.porter_id, d) for d in need.porter_dates]
+        guide_keys = [(need.guide_id, d) for d in need.guide_dates]
+        ok = (all(not count or
+                  porter_allocated.get(key, 0) + need.porters <= count
+                  for key in porter_keys) and
+              all(not guide_allocated.get(key, 0) for key in guide_keys))
+        if ok:
+            for key in porter_keys:
+                porter_allocated[key] = (porter_allocated.get(key, 0) +
+                                         need.porters)
+            for key in guide_keys:
+                guide_allocated[key] = guide_allocated.get(key, 0) + 1
+        results.append(ok)
+    return results
@@ -0,0 +1,12 @@
+from config import celery_app
+
+from simplifytour.bookings.models import Booking
+
+
+@celery_app.task()
+def expire_holds():
+    """
+    Releases the seats of held bookings that weren't confirmed in
+    time. Scheduled every minute.
+    """
+    return Booking.objects.expire()
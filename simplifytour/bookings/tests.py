@@ -1,3 +1,204 @@
-from django.test import TestCase
+import logging
+import threading
+import time
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from simplifytour.bookings.models import (Booking, GuideDay, HoldExpired,
+                                          Inventory, PorterDay,
+                                          SeatsUnavailable, StaffUnavailable)
+from simplifytour.bookings.staffing import can_staff
+from simplifytour.packages.models import Guide, Package, Porter, Price
+
+logger = logging.getLogger(__name__)
+
+
+def create_departure(max_group_size, starting_date=date(2026, 10, 1),
+                     **package_fields):
+    user, created = get_user_model().objects.get_or_create(
+        email="guide@example.com")
+    package = Package.objects.create(title="Annapurna Circuit", content="",
+                                     provided_by=user, site_id=1,
+                                     **package_fields)
+    price = Price.objects.create(package=package, discounted_price=100,
+                                 min_group_size=1,
+                                 max_group_size=max_group_size,
+                                 price_notes="Autumn",
+                                 starting_date=[starting_date])
+    return price.departures.get()
+
+
+class BookingTests(TestCase):
+
+    def setUp(self):
+        self.departure = create_departure(4)
+
+    def seats_taken(self):
+        return Inventory.objects.get(departure=self.departure).seats_taken
+
+    def test_hold_and_confirm(self):
+        booking = Booking.objects.hold(self.departure, 3)
+        booking.confirm()
+        self.assertEqual(Booking.objects.get().status, Booking.CONFIRMED)
+        self.assertEqual(self.seats_taken(), 3)
+        with self.assertRaises(SeatsUnavailable):
+            Booking.objects.hold(self.departure, 2)
+
+    def test_take_only_checks_inventory_row(self):
+        """
+        The seat check must only read the inventory row being updated.
+        A check that goes through a join or subquery isn't re-evaluated
+        by PostgreSQL after waiting on another booker's row lock, which
+        lets two bookers take the last seat.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            Booking.objects.hold(self.departure, 1)
+        updates = [q["sql"] for q in queries.captured_queries
+                   if q["sql"].startswith('UPDATE "bookings_inventory"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("SELECT", updates[0])
+        self.assertNotIn("packages_departure", updates[0])
+
+    def test_capacity_follows_price(self):
+        Booking.objects.hold(self.departure, 3)
+        price = self.departure.price
+        price.max_group_size = 3
+        price.save()
+        self.assertEqual(Inventory.objects.get().capacity, 3)
+        with self.assertRaises(SeatsUnavailable):
+            Booking.objects.hold(self.departure, 1)
+
+    def test_removed_date_with_bookings(self):
+        Booking.objects.hold(self.departure, 1)
+        price = self.departure.price
+        price.starting_date = [date(2026, 10, 2)]
+        price.save()
+        self.departure.refresh_from_db()
+        self.assertFalse(self.departure.is_active)
+        self.assertEqual(Inventory.objects.get(
+            departure=self.departure).capacity, 0)
+        self.assertEqual(list(price.departures.available()),
+                         [price.departures.get(date=date(2026, 10, 2))])
+        with self.assertRaises(SeatsUnavailable):
+            Booking.objects.hold(self.departure, 1)
+
+    def test_cancel_gives_seats_back(self):
+        booking = Booking.objects.hold(self.departure, 4)
+        self.assertTrue(booking.cancel())
+        self.assertFalse(booking.cancel())
+        self.assertEqual(self.seats_taken(), 0)
+        Booking.objects.hold(self.departure, 4)
+
+    def test_expired_hold(self):
+        booking = Booking.objects.hold(self.departure, 4)
+        Booking.objects.filter(pk=booking.pk).update(
+            expires_at=now() - timedelta(seconds=1))
+        with self.assertRaises(HoldExpired):
+            booking.confirm()
+        # The full departure releases the expired hold to make room.
+        Booking.objects.hold(self.departure, 2)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status,
+                         Booking.EXPIRED)
+        self.assertEqual(self.seats_taken(), 2)
+
+
+class StaffCalendarTests(TestCase):
+
+    def setUp(self):
+        self.porter = Porter.objects.create(ratio=2, count=3, rate=15,
+                                            remarks="Porters")
+        self.guide = Guide.objects.create(language="English", rate=30,
+                                          remarks="Guide")
+        staff = dict(porter_required=True, porter_days=3, guide_required=True,
+                     guide_days=2)
+        self.departures = [
+            create_departure(10, date(2026, 10, 1), **staff),
+            create_departure(10, date(2026, 10, 3), **staff),
+            create_departure(10, date(2026, 10, 5), **staff),
+        ]
+        for departure in self.departures:
+            departure.package.porters.add(self.porter)
+            departure.package.guides.add(self.guide)
+
+    def test_hold_allocates_staff(self):
+        booking = Booking.objects.hold(self.departures[0], 5)
+        self.assertEqual((booking.porters, booking.porter_days), (3, 3))
+        self.assertEqual(list(PorterDay.objects.values_list(
+            "date", "allocated")), [(date(2026, 10, d), 3) for d in (1, 2, 3)])
+        self.assertEqual(GuideDay.objects.filter(allocated=1).count(), 2)
+        # Porters are fully allocated on 3 October.
+        with self.assertRaises(StaffUnavailable):
+            Booking.objects.hold(self.departures[1], 1)
+        self.assertFalse(Inventory.objects.filter(
+            departure=self.departures[1], seats_taken__gt=0).exists())
+        booking.cancel()
+        self.assertFalse(PorterDay.objects.filter(allocated__gt=0).exists())
+        Booking.objects.hold(self.departures[1], 1)
+
+    def test_can_staff(self):
+        Booking.objects.hold(self.departures[0], 2)
+        with self.assertNumQueries(5):
+            staffed = can_staff([(self.departures[1], 4),
+                                 (self.departures[1], 2),
+                                 (self.departures[2], 2)])
+        # The second request needs a fourth porter on 3 October, and
+        # the guide is already leading the first request's group.
+        self.assertEqual(staffed, [True, False, True])
+
+
+# SQLite's in-memory test database locks whole tables between threads,
+# so this runs against databases with row locks, such as PostgreSQL on
+# CI. ``test_take_only_checks_inventory_row`` covers the race on SQLite.
+@skipUnlessDBFeature("has_select_for_update")
+class BookingLoadTests(TransactionTestCase):
+
+    seats = 50
+    bookers = 20
+
+    def test_parallel_bookers(self):
+        """
+        Many bookers hold and confirm single seats on one departure
+        at once. Every seat is sold exactly once.
+        """
+        departure = create_departure(self.seats)
+        Inventory.objects.for_departure(departure)
+        results = {"confirmed": 0, "sold_out": 0}
+        lock = threading.Lock()
+        start = threading.Barrier(self.bookers)
+
+        def book():
+            start.wait()
+            try:
+                while True:
+                    try:
+                        Booking.objects.hold(departure, 1).confirm()
+                        outcome = "confirmed"
+                    except SeatsUnavailable:
+                        outcome = "sold_out"
+                    with lock:
+                        results[outcome] += 1
+                    if outcome == "sold_out":
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book) for i in range(self.bookers)]
+        began = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - began
+
+        self.assertEqual(results["confirmed"], self.seats)
+        self.assertEqual(results["sold_out"], self.bookers)
+        self.assertEqual(Booking.objects.filter(
+            status=Booking.CONFIRMED).count(), self.seats)
+        self.assertEqual(Inventory.objects.get().seats_taken, self.seats)
+        logger.info("%s bookers sold %s seats in %.2fs (%.0f bookings/s)",
+                    self.bookers, self.seats, elapsed, self.seats / elapsed)
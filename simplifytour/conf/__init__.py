@@ -4,12 +4,16 @@ from future.builtins import bytes, str
 
 from functools import partial
 from importlib import import_module
+from time import monotonic
 from warnings import warn
 
 from django.utils.module_loading import module_has_submodule
 from django.conf import settings as django_settings
+from django.core.cache import cache
 from django.utils.functional import Promise
 
+from simplifytour.utils.cache import bump_cache_version, get_cache_version
+
 
 _thread_local = threading.local()
 
@@ -22,6 +26,30 @@ def current_request():
 
 registry = {}
 
+VERSION_CACHE_KEY = "simplifytour.conf.version.%s"
+SNAPSHOT_CACHE_KEY = "simplifytour.conf.snapshot.%s.%s"
+
+
+def _version_cache_key(site_id=None):
+    return VERSION_CACHE_KEY % (site_id or django_settings.SITE_ID)
+
+
+def get_settings_version(site_id=None):
+    """
+    Returns the version of the editable settings stored in the shared
+    cache.
+    """
+    return get_cache_version(_version_cache_key(site_id))
+
+
+def bump_settings_version(site_id=None):
+    """
+    Marks the editable settings for the site as changed, so every
+    process reloads them from the database on next access. Called
+    when a ``Setting`` is saved or deleted.
+    """
+    bump_cache_version(_version_cache_key(site_id))
+
 
 def register_setting(name=None, label=None, editable=False, description=None,
                      default=None, choices=None, append=False,
@@ -113,10 +141,13 @@ class Settings(object):
         """
         The ``_editable_caches`` attribute maps Request objects to dicts of
         editable settings loaded from the database. We cache settings per-
-        request to ensure that the database is hit at most once per request,
-        and that each request sees the same settings for its duration.
+        request to ensure that each request sees the same settings for its
+        duration. ``_snapshots`` maps site IDs to the version in the
+        shared cache of the last loaded settings, the settings, and when
+        the version was last checked.
         """
         self._editable_caches = WeakKeyDictionary()
+        self._snapshots = {}
 
     @property
     def _current_request(self):
@@ -137,24 +168,59 @@ class Settings(object):
              stacklevel=2)
 
     def clear_cache(self):
-        """Clear the settings cache for the current request."""
+        """
+        Clear the settings cache for the current request, along with
+        the process and shared snapshots, so that editable settings
+        are fetched from the database on next access.
+        """
         self._editable_caches.pop(self._current_request, None)
+        site_id = django_settings.SITE_ID
+        version, _, _ = self._snapshots.pop(site_id, (None, None, None))
+        if version is not None:
+            cache.delete(SNAPSHOT_CACHE_KEY % (site_id, version))
 
     def _get_editable(self, request):
         """
         Get the dictionary of editable settings for a given request. Settings
-        are fetched from the database once per request and then stored in
-        ``_editable_caches``, a WeakKeyDictionary that will automatically
+        are fetched once per request (see ``_get_snapshot``) and then stored
+        in ``_editable_caches``, a WeakKeyDictionary that will automatically
         discard each entry when no more references to the request exist.
         """
         try:
             editable_settings = self._editable_caches[request]
         except KeyError:
-            editable_settings = self._load()
-            if request is not self.NULL_REQUEST:
-                self._editable_caches[request] = editable_settings
+            if request is self.NULL_REQUEST:
+                max_age = django_settings.SETTINGS_SNAPSHOT_MAX_AGE
+                return self._get_snapshot(max_age=max_age)
+            editable_settings = self._get_snapshot()
+            self._editable_caches[request] = editable_settings
         return editable_settings
 
+    def _get_snapshot(self, max_age=0):
+        """
+        Return the editable settings for the current site without
+        touching the database while they're unchanged. Each process
+        keeps the last snapshot it loaded along with its version, and
+        only checks the version in the shared cache, at most once every
+        ``max_age`` seconds. When the version has changed, the snapshot
+        is taken from the shared cache, and only loaded from the
+        database by the first process to ask.
+        """
+        site_id = django_settings.SITE_ID
+        loaded_version, snapshot, checked = self._snapshots.get(
+            site_id, (None, None, None))
+        if checked is not None and monotonic() - checked < max_age:
+            return snapshot
+        version = get_settings_version(site_id)
+        if loaded_version != version:
+            key = SNAPSHOT_CACHE_KEY % (site_id, version)
+            snapshot = cache.get(key)
+            if snapshot is None:
+                snapshot = self._load()
+                cache.set(key, snapshot)
+        self._snapshots[site_id] = (version, snapshot, monotonic())
+        return snapshot
+
     @classmethod
     def _to_python(cls, setting, raw_value):
         """
@@ -1,8 +1,11 @@
 from __future__ import unicode_literals
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
+from simplifytour.conf import bump_settings_version
 from simplifytour.core.models import SiteRelated
 
 
@@ -20,3 +23,14 @@ class Setting(SiteRelated):
 
     def __str__(self):
         return "%s: %s" % (self.name, self.value)
+
+
+@receiver(post_save, sender=Setting)
+@receiver(post_delete, sender=Setting)
+def setting_changed(sender, instance, **kwargs):
+    """
+    Invalidate the cached editable settings once the change is
+    committed, so other processes never cache uncommitted values.
+    """
+    site_id = instance.site_id
+    transaction.on_commit(lambda: bump_settings_version(site_id))
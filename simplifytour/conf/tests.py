@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from simplifytour import conf
+from simplifytour.conf import settings
+
+
+@override_settings(SETTINGS_SNAPSHOT_MAX_AGE=5)
+class SettingsSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        settings.clear_cache()
+        self.addCleanup(settings.clear_cache)
+        patcher = mock.patch("simplifytour.conf.get_settings_version",
+                             wraps=conf.get_settings_version)
+        self.get_version = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_version_checked_once_per_max_age(self):
+        """
+        Outside of a request, the version in the shared cache is only
+        checked again once ``SETTINGS_SNAPSHOT_MAX_AGE`` has passed.
+        """
+        with mock.patch("simplifytour.conf.monotonic", return_value=100):
+            for _ in range(3):
+                settings._get_editable(settings.NULL_REQUEST)
+        self.assertEqual(self.get_version.call_count, 1)
+        with mock.patch("simplifytour.conf.monotonic", return_value=104):
+            settings._get_editable(settings.NULL_REQUEST)
+        self.assertEqual(self.get_version.call_count, 1)
+        with mock.patch("simplifytour.conf.monotonic", return_value=105):
+            settings._get_editable(settings.NULL_REQUEST)
+        self.assertEqual(self.get_version.call_count, 2)
+
+    def test_version_change_seen_after_max_age(self):
+        with mock.patch("simplifytour.conf.monotonic", return_value=100):
+            settings._get_editable(settings.NULL_REQUEST)
+        conf.bump_settings_version()
+
+        with mock.patch.object(conf.Settings, "_load", return_value={"A": 1}):
+            with mock.patch("simplifytour.conf.monotonic", return_value=101):
+                self.assertNotEqual(
+                    settings._get_editable(settings.NULL_REQUEST), {"A": 1})
+            with mock.patch("simplifytour.conf.monotonic", return_value=106):
+                self.assertEqual(
+                    settings._get_editable(settings.NULL_REQUEST), {"A": 1})
@@ -83,6 +83,34 @@ class DisplayableAdmin(BaseTranslationModelAdmin):
         """
         super(DisplayableAdmin, self).save_model(request, obj, form, change)
 
+    def save_formset(self, request, form, formset, change):
+        """
+        Inline forms for ``Orderable`` models where only ``_order``
+        changed, eg after being dragged into a new position, are
+        updated together with ``Orderable.reorder`` instead of being
+        saved one at a time.
+        """
+        orders = {}
+        if issubclass(formset.model, Orderable):
+            for inline_form in formset.initial_forms:
+                order = inline_form.cleaned_data.get("_order")
+                if (inline_form.changed_data == ["_order"] and
+                        order is not None and
+                        not formset._should_delete_form(inline_form)):
+                    orders[inline_form.instance.pk] = order
+        if not orders:
+            super(DisplayableAdmin, self).save_formset(request, form, formset,
+                                                       change)
+            return
+        instances = formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            formset.delete_existing(obj)
+        for instance in instances:
+            if instance.pk not in orders:
+                instance.save()
+        formset.save_m2m()
+        formset.model.reorder(orders)
+
 
 class OwnableAdmin(admin.ModelAdmin):
     """
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+class QuotaUploadHandler(FileUploadHandler):
+    """
+    Stops reading an upload as soon as the files in the request add up
+    to more than ``GRAPHQL_UPLOAD_MAX_SIZE`` bytes, and marks the
+    request with ``upload_quota_exceeded`` so the view can reject it.
+    Must come before the handlers that store the data.
+    """
+
+    def __init__(self, request=None, quota=None):
+        super(QuotaUploadHandler, self).__init__(request)
+        self.quota = quota or settings.GRAPHQL_UPLOAD_MAX_SIZE
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.quota:
+            self.request.upload_quota_exceeded = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
@@ -1,20 +1,39 @@
 import json
 import logging
 from django.conf import settings
-from graphene_django.views import GraphQLView
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import HttpResponse
+from graphene_django.views import GraphQLView, HttpError
+
+from simplifytour.core.file_upload.handlers import QuotaUploadHandler
 
 # This class is modified verion of the `ModifiedGraphQLView` class from
 # `graphene-file-upload` (https://github.com/lmcgartland/graphene-file-upload).
 
 logger = logging.getLogger('file_upload')
 
+ERROR_UPLOAD_TOO_LARGE = "Uploads are limited to %s bytes per request."
+
 
 class FileUploadGraphQLView(GraphQLView):
     def dispatch(self, request, *args, **kwargs):
         # Handle options method the GraphQlView restricts it.
         if request.method == 'OPTIONS':
             response = self.options(request, *args, **kwargs)
+        elif self.upload_too_large(request):
+            # Refuse before reading the body rather than once it has
+            # been received.
+            response = HttpResponse(
+                status=413, content_type='application/json',
+                content=self.json_encode(request, {'errors': [
+                    {'message': ERROR_UPLOAD_TOO_LARGE %
+                     settings.GRAPHQL_UPLOAD_MAX_SIZE}]}))
         else:
+            # Stream file parts to temporary files on disk, whatever
+            # their size, and stop once the quota is exceeded, in case
+            # the body is longer than Content-Length claimed.
+            request.upload_handlers = [QuotaUploadHandler(request),
+                                       TemporaryFileUploadHandler(request)]
             response = super().dispatch(request, *args, **kwargs)
         # Add access control headers
         response['Access-Control-Allow-Origin'] = ','.join(
@@ -24,8 +43,20 @@ class FileUploadGraphQLView(GraphQLView):
             'Access-Control-Allow-Headers'] = 'Origin, Content-Type, Accept, Authorization'
         return response
 
+    @staticmethod
+    def upload_too_large(request):
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return False
+        return content_length > settings.GRAPHQL_UPLOAD_MAX_SIZE
+
     @staticmethod
     def get_graphql_params(request, data):
+        if getattr(request, 'upload_quota_exceeded', False):
+            raise HttpError(HttpResponse(status=413),
+                            ERROR_UPLOAD_TOO_LARGE %
+                            settings.GRAPHQL_UPLOAD_MAX_SIZE)
         content_type = GraphQLView.get_content_type(request)
 
         # Only check multipart/form-data if content_type is not None (this is
@@ -44,7 +75,7 @@ class FileUploadGraphQLView(GraphQLView):
                     # file key is which file it is in the form-data
                     file_instances = files_map[file_key]
                     for file_instance in file_instances:
-                        test = obj_set(operations, file_instance, file_key, False)
+                        obj_set(operations, file_instance, file_key, False)
                 query = operations.get('query')
                 variables = operations.get('variables')
             except Exception as e:
@@ -75,29 +106,28 @@ def getShallowProperty(obj, prop):
 
 
 def obj_set(obj, path, value, doNotReplace):
+    """
+    Sets ``value`` at ``path`` in ``obj``, where ``path`` is a list of
+    keys and indexes or a dotted string such as ``variables.files.0``,
+    creating missing dicts and lists along the way. Walks the path in
+    a loop, splitting a string path once.
+    """
     if type(path) is int:
         path = [path]
+    elif isinstance(path, str):
+        path = list(map(getKey, path.split('.')))
     if path is None or len(path) == 0:
         return obj
-    if isinstance(path, str):
-        newPath = list(map(getKey, path.split('.')))
-        return obj_set(obj, newPath, value, doNotReplace)
-
-    currentPath = path[0]
-    currentValue = getShallowProperty(obj, currentPath)
 
-    if len(path) == 1:
-        if currentValue is None or not doNotReplace:
-            obj[currentPath] = value
-
-    if currentValue is None:
-        try:
-            if type(path[1]) == int:
-                obj[currentPath] = []
-            else:
-                obj[currentPath] = {}
-        except Exception as e:
-            logger.error(e)
-            pass
-
-    return obj_set(obj[currentPath], path[1:], value, doNotReplace)
+    target = obj
+    for currentPath, nextPath in zip(path, path[1:]):
+        currentValue = getShallowProperty(target, currentPath)
+        if currentValue is None:
+            currentValue = [] if type(nextPath) is int else {}
+            target[currentPath] = currentValue
+        target = currentValue
+
+    lastPath = path[-1]
+    if not doNotReplace or getShallowProperty(target, lastPath) is None:
+        target[lastPath] = value
+    return obj
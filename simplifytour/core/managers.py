@@ -1,9 +1,12 @@
 from functools import reduce
 from operator import ior, iand
-from string import punctuation
 
 from django.contrib.sites.managers import CurrentSiteManager as DjangoCSM
-from django.db.models import Manager, Q, CharField, TextField
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import (Manager, Q, CharField, ExpressionWrapper, F,
+                              Func, IntegerField, OuterRef, Subquery,
+                              TextField, Value)
+from django.db.models.functions import Length
 from django.core.exceptions import ImproperlyConfigured
 from django.db.models.manager import ManagerDescriptor
 from django.contrib.sites.models import Site
@@ -12,6 +15,8 @@ from django.utils.timezone import now
 from django.conf import settings
 from django.apps import apps
 
+from simplifytour.core.search import (SearchResults, get_search_backend,
+                                      parse_query, search_score_annotations)
 from simplifytour.utils.urls import home_slug
 
 
@@ -111,29 +116,7 @@ class SearchableQuerySet(QuerySet):
 
         # ### BUILD LIST OF TERMS TO SEARCH FOR ###
 
-        # Remove extra spaces, put modifiers inside quoted terms.
-        terms = " ".join(query.split()).replace("+ ", "+")     \
-                                       .replace('+"', '"+')    \
-                                       .replace("- ", "-")     \
-                                       .replace('-"', '"-')    \
-                                       .split('"')
-        # Strip punctuation other than modifiers from terms and create
-        # terms list, first from quoted terms and then remaining words.
-        terms = [("" if t[0:1] not in "+-" else t[0:1]) + t.strip(punctuation)
-            for t in terms[1::2] + "".join(terms[::2]).split()]
-        # Remove stop words from terms that aren't quoted or use
-        # modifiers, since words with these are an explicit part of
-        # the search query. If doing so ends up with an empty term
-        # list, then keep the stop words.
-        terms_no_stopwords = [t for t in terms if t.lower() not in
-            settings.STOP_WORDS]
-        get_positive_terms = lambda terms: [t.lower().strip(punctuation)
-            for t in terms if t[0:1] != "-"]
-        positive_terms = get_positive_terms(terms_no_stopwords)
-        if positive_terms:
-            terms = terms_no_stopwords
-        else:
-            positive_terms = get_positive_terms(terms)
+        terms, positive_terms = parse_query(query)
         # Append positive terms (those without the negative modifier)
         # to the internal list for sorting when results are iterated.
         if not positive_terms:
@@ -143,13 +126,15 @@ class SearchableQuerySet(QuerySet):
 
         # ### BUILD QUERYSET FILTER ###
 
+        # Each term is turned into a filter by the search backend,
+        # which may use an index rather than ``icontains``.
+        backend = get_search_backend(self.db)
+        fields = list(self._search_fields.keys())
+        term_filter = lambda term: backend.term_filter(self, term, fields)
         # Create the queryset combining each set of terms.
-        excluded = [reduce(iand, [~Q(**{"%s__icontains" % f: t[1:]}) for f in
-            self._search_fields.keys()]) for t in terms if t[0:1] == "-"]
-        required = [reduce(ior, [Q(**{"%s__icontains" % f: t[1:]}) for f in
-            self._search_fields.keys()]) for t in terms if t[0:1] == "+"]
-        optional = [reduce(ior, [Q(**{"%s__icontains" % f: t}) for f in
-            self._search_fields.keys()]) for t in terms if t[0:1] not in "+-"]
+        excluded = [~term_filter(t[1:]) for t in terms if t[0:1] == "-"]
+        required = [term_filter(t[1:]) for t in terms if t[0:1] == "+"]
+        optional = [term_filter(t) for t in terms if t[0:1] not in "+-"]
         queryset = self
         if excluded:
             queryset = queryset.filter(reduce(iand, excluded))
@@ -181,9 +166,12 @@ class SearchableQuerySet(QuerySet):
 
     def annotate_scores(self):
         """
-        If search has occurred and no ordering has occurred, decorate
-        each result with the number of search terms so that it can be
-        sorted by the number of occurrence of terms.
+        If search has occurred and no ordering has occurred, annotate
+        each result with a ``result_count`` score based on the number
+        of occurrences of search terms, weighted by search field and
+        decayed by age, and order by it. The score is computed by the
+        database (see ``simplifytour.core.search``), so the results
+        can be sliced and paginated without loading every match.
         In the case of search fields that span model relationships, we
         cannot accurately match occurrences without some very
         complicated traversal code, which we won't attempt. So in this
@@ -192,30 +180,13 @@ class SearchableQuerySet(QuerySet):
         we assume one match for one of the fields, and use the average
         weight of all search fields with relationships.
         """
-        results = super(SearchableQuerySet, self).iterator()
-        if self._search_terms and not self._search_ordered:
-            results = list(results)
-            for i, result in enumerate(results):
-                count = 0
-                related_weights = []
-                for (field, weight) in self._search_fields.items():
-                    if "__" in field:
-                        related_weights.append(weight)
-                    for term in self._search_terms:
-                        field_value = getattr(result, field, None)
-                        if field_value:
-                            count += field_value.lower().count(term) * weight
-                if not count and related_weights:
-                    count = int(sum(related_weights) / len(related_weights))
-
-                if result.publish_date:
-                    age = (now() - result.publish_date).total_seconds()
-                    if age > 0:
-                        count = count / age**settings.SEARCH_AGE_SCALE_FACTOR
-
-                results[i].result_count = count
-            return iter(results)
-        return results
+        if not self._search_terms or self._search_ordered:
+            return self
+        queryset = self
+        for annotation in search_score_annotations(self.model,
+                self._search_fields, self._search_terms, "result_count"):
+            queryset = queryset.annotate(**annotation)
+        return queryset.order_by("-result_count")
 
 
 class SearchableManager(Manager):
@@ -226,6 +197,8 @@ class SearchableManager(Manager):
     model being used to search.
     """
 
+    queryset_class = SearchableQuerySet
+
     def __init__(self, *args, **kwargs):
         self._search_fields = kwargs.pop("search_fields", {})
         super(SearchableManager, self).__init__(*args, **kwargs)
@@ -264,7 +237,7 @@ class SearchableManager(Manager):
 
     def get_queryset(self):
         search_fields = self.get_search_fields()
-        return SearchableQuerySet(self.model, search_fields=search_fields)
+        return self.queryset_class(self.model, search_fields=search_fields)
 
     def contribute_to_class(self, model, name):
         """
@@ -275,11 +248,11 @@ class SearchableManager(Manager):
         super(SearchableManager, self).contribute_to_class(model, name)
         setattr(model, name, ManagerDescriptor(self))
 
-    def search(self, *args, **kwargs):
+    def search_models(self):
         """
-        Proxy to queryset's search method for the manager's model and
-        any models that subclass from this manager's model if the
-        model is abstract.
+        Returns the models searched by ``search`` and
+        ``search_results``: the manager's model, or if the model is
+        abstract, the models subclassing it.
         """
         if not settings.SEARCH_MODEL_CHOICES:
             # No choices defined - build a list of leaf models (those
@@ -338,17 +311,92 @@ class SearchableManager(Manager):
             models -= parents
         else:
             models = [self.model]
-        all_results = []
+        return models
+
+    def _search_querysets(self, *args, **kwargs):
         user = kwargs.pop("for_user", None)
-        for model in models:
+        for model in self.search_models():
             try:
                 queryset = model.objects.published(for_user=user)
             except AttributeError:
                 queryset = model.objects.get_queryset()
-            all_results.extend(
-                queryset.search(*args, **kwargs).annotate_scores())
+            yield model, queryset.search(*args, **kwargs).annotate_scores()
+
+    def search(self, *args, **kwargs):
+        """
+        Proxy to queryset's search method for the manager's model and
+        any models that subclass from this manager's model if the
+        model is abstract.
+        """
+        all_results = []
+        for model, queryset in self._search_querysets(*args, **kwargs):
+            all_results.extend(queryset)
         return sorted(all_results, key=lambda r: r.result_count, reverse=True)
 
+    def search_results(self, *args, **kwargs):
+        """
+        Same as ``search``, but the scored querysets for each model
+        are combined with ``UNION ALL`` and ordered by score in the
+        database. Returns a lazy ``SearchResults`` which can be
+        passed to a ``Paginator``: counting runs one query, and each
+        page runs one query plus one per model on the page.
+        """
+        rows = []
+        for model, queryset in self._search_querysets(*args, **kwargs):
+            if not queryset._search_terms:
+                continue
+            content_type = ContentType.objects.get_for_model(
+                model, for_concrete_model=False)
+            rows.append(queryset.order_by().annotate(
+                result_id=F("pk"),
+                result_content_type=Value(content_type.id, IntegerField()),
+            ).values_list("result_id", "result_content_type", "result_count"))
+        if not rows:
+            return SearchResults(None)
+        union = rows[0].union(*rows[1:], all=True) if len(rows) > 1 else rows[0]
+        return SearchResults(union.order_by(
+            "-result_count", "result_content_type", "result_id"))
+
+
+class TreeManager(Manager):
+    """
+    Tree lookups for models that subclass the abstract
+    ``Hierarchical`` model, each using a single query against the
+    indexed ``tree_path`` column.
+    """
+
+    def ancestors(self, node, include_self=False):
+        """
+        Returns the ancestors of the given object, from the root down.
+        """
+        ids = node.tree_path.split("/")[:-1]
+        if not include_self:
+            ids = ids[:-1]
+        return self.filter(pk__in=ids).order_by(Length("tree_path"))
+
+    def descendants(self, node, include_self=False):
+        """
+        Returns every object below the given object in the tree.
+        """
+        if not node.tree_path:
+            return self.none()
+        descendants = self.filter(tree_path__startswith=node.tree_path)
+        if not include_self:
+            descendants = descendants.exclude(pk=node.pk)
+        return descendants
+
+    def with_descendant_count(self):
+        """
+        Annotates each object with ``descendant_count``, the size of
+        its subtree excluding itself.
+        """
+        descendants = self.model._base_manager.filter(
+            tree_path__startswith=OuterRef("tree_path"))
+        count = descendants.order_by().annotate(
+            count=Func(F("pk"), function="COUNT")).values("count")
+        return self.annotate(descendant_count=ExpressionWrapper(
+            Subquery(count) - 1, output_field=IntegerField()))
+
 
 class DisplayableManager(CurrentSiteManager, PublishedManager,
                          SearchableManager):
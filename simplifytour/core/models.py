@@ -8,6 +8,7 @@ except ImportError:
     from urllib import urlopen, urlencode
 
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.sites.managers import CurrentSiteManager
 from django.template.defaultfilters import truncatewords_html
 from django.utils.html import format_html, strip_tags
@@ -15,10 +16,11 @@ from django.utils.translation import ugettext, ugettext_lazy as _
 from django.utils.timesince import timesince
 from django.contrib.sites.models import Site
 from django.db.models.base import ModelBase
+from django.db.models.functions import Concat, Substr
 from django.utils.timezone import now
 from django.conf import settings
 from django.apps import apps
-from django.db import models
+from django.db import models, router, transaction
 
 from simplifytour.utils.urls import admin_url, slugify, unique_slug
 from simplifytour.core.managers import DisplayableManager
@@ -105,13 +107,20 @@ class Slugged(SiteRelated):
 
     def save(self, *args, **kwargs):
         """
-        If no slug is provided, generates one before saving.
+        If no slug is provided, generates one before saving. The slug
+        is generated and saved in the same transaction, so that
+        concurrent saves can't both be given the same slug.
         """
-        if not self.slug:
-            self.slug = self.generate_unique_slug()
-        super(Slugged, self).save(*args, **kwargs)
+        if self.slug:
+            super(Slugged, self).save(*args, **kwargs)
+            return
+        using = kwargs.get("using") or router.db_for_write(
+            self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            self.slug = self.generate_unique_slug(using=using)
+            super(Slugged, self).save(*args, **kwargs)
 
-    def generate_unique_slug(self):
+    def generate_unique_slug(self, using=None):
         """
         Create a unique slug by passing the result of get_slug() to
         utils.urls.unique_slug, which appends an index if necessary.
@@ -119,7 +128,7 @@ class Slugged(SiteRelated):
         # For custom content types, use the ``Page`` instance for
         # slug lookup.
         concrete_model = base_concrete_model(Slugged, self)
-        slug_qs = concrete_model.objects.exclude(id=self.id)
+        slug_qs = concrete_model.objects.using(using).exclude(id=self.id)
         return unique_slug(slug_qs, "slug", self.get_slug())
 
     def get_slug(self):
@@ -239,6 +248,8 @@ class Displayable(Slugged, MetaData, TimeStamped):
         blank=True, null=True)
     short_url = models.URLField(blank=True, null=True)
     in_sitemap = models.BooleanField(_("Show in sitemap"), default=True)
+    # Maintained by ``simplifytour.core.search.PostgresSearchBackend``.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = wrapped_manager(DisplayableManager)
     search_fields = {"keywords": 10, "title": 5}
@@ -449,6 +460,27 @@ class Orderable(with_metaclass(OrderableBase, models.Model)):
             self._order = concrete_model.objects.filter(**lookup).count()
         super(Orderable, self).save(*args, **kwargs)
 
+    @classmethod
+    def reorder(cls, ids, **lookup):
+        """
+        Sets ``_order`` for each of the given ids to its position in
+        ``ids`` with a single ``UPDATE``, rather than saving each
+        object. ``ids`` can also be a dict mapping ids to their new
+        ``_order`` values. Any ``lookup`` given is applied as a filter,
+        eg to limit the update to the children of a single parent.
+        Returns the number of rows updated.
+        """
+        if not isinstance(ids, dict):
+            ids = dict((pk, i) for i, pk in enumerate(ids) if pk is not None)
+        if not ids:
+            return 0
+        concrete_model = base_concrete_model(Orderable, cls)
+        order = models.Case(*[models.When(pk=pk, then=models.Value(i))
+                              for pk, i in ids.items()],
+                            output_field=models.IntegerField())
+        return concrete_model.objects.filter(pk__in=list(ids), **lookup
+                                             ).update(_order=order)
+
     def delete(self, *args, **kwargs):
         """
         Update the ordering values for siblings.
@@ -558,3 +590,94 @@ class ContentTyped(models.Model):
         """
         return (getattr(self, self.content_model) if self.content_model
                 else self)
+
+
+class Hierarchical(models.Model):
+    """
+    Abstract model for trees built with a ``parent`` foreign key on
+    the concrete model. Maintains ``tree_path``, the ids from the
+    root down to the object separated by slashes, so that
+    ``TreeManager`` can look up ancestors, descendants and subtree
+    sizes with one indexed query each. Moving an object rewrites the
+    paths of its whole subtree with a single ``UPDATE``.
+    """
+
+    tree_path = models.CharField(editable=False, max_length=1000,
+                                 blank=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Hierarchical, cls).from_db(db, field_names, values)
+        instance._loaded_parent_id = getattr(instance, "parent_id", None)
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Update ``tree_path`` once the object has an id, and whenever
+        its parent changes. Updates of existing objects only write the
+        fields from ``saved_fields``.
+        """
+        if (not self._state.adding and not kwargs.get("force_insert")
+                and kwargs.get("update_fields") is None):
+            kwargs["update_fields"] = self.saved_fields()
+        super(Hierarchical, self).save(*args, **kwargs)
+        if (not self.tree_path or
+                self.parent_id != getattr(self, "_loaded_parent_id", None)):
+            self.update_tree_path()
+        self._loaded_parent_id = self.parent_id
+
+    def saved_fields(self):
+        """
+        Names of the fields written when an existing object is saved.
+        ``tree_path`` is left out, since moving an ancestor rewrites it
+        in the database and the instance's value may be out of date.
+        Deferred fields are left out too.
+        """
+        skipped = set(["tree_path"]) | self.get_deferred_fields()
+        return [f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in skipped]
+
+    def update_tree_path(self):
+        """
+        Set ``tree_path`` from the parent's path, and replace the old
+        path, as currently stored, at the start of every descendant's
+        path.
+        """
+        manager = base_concrete_model(Hierarchical, self)._base_manager
+        path = "%s/" % self.pk
+        if self.parent_id:
+            parent_path = manager.filter(pk=self.parent_id).values_list(
+                "tree_path", flat=True).first()
+            path = (parent_path or "") + path
+        old_path = manager.filter(pk=self.pk).values_list(
+            "tree_path", flat=True).first()
+        self.tree_path = path
+        if path == old_path:
+            return
+        if old_path:
+            manager.filter(tree_path__startswith=old_path).update(
+                tree_path=Concat(models.Value(path),
+                                 Substr("tree_path", len(old_path) + 1)))
+        else:
+            manager.filter(pk=self.pk).update(tree_path=path)
+
+    def has_tree_path(self):
+        """
+        Whether ``tree_path`` has been written and ends with the
+        current parent, which isn't the case for objects created or
+        moved without ``save``, such as by ``loaddata``,
+        ``bulk_create`` or ``update()``.
+        """
+        ids = self.tree_path.split("/")[:-1]
+        parent_ids = [str(self.parent_id)] if self.parent_id else []
+        return ids[-2:] == parent_ids + [str(self.pk)]
+
+    @property
+    def tree_depth(self):
+        """
+        Number of ancestors, zero for root objects.
+        """
+        return max(self.tree_path.count("/") - 1, 0)
@@ -0,0 +1,595 @@
+import json
+import re
+from collections import defaultdict
+from functools import reduce
+from operator import add, ior
+from string import punctuation
+from threading import RLock
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import (
+    Case, DateTimeField, F, FloatField, Func, Q, Value, When
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, Length, Lower, Power, Replace
+from django.db.models.signals import post_delete, post_save
+from django.utils.timezone import now
+
+from simplifytour.utils.importing import import_dotted_path
+
+
+tokenize = re.compile(r"\w+", re.UNICODE).findall
+
+
+def parse_query(query):
+    """
+    Split a search query into terms, treating quoted terms as exact
+    phrases and keeping the ``+`` and ``-`` modifiers at the start of
+    each term. Returns the list of terms and the list of positive
+    terms (those without the negative modifier), lowercased, which
+    are used for scoring results.
+    """
+    # Remove extra spaces, put modifiers inside quoted terms.
+    terms = " ".join(query.split()).replace("+ ", "+")     \
+                                   .replace('+"', '"+')    \
+                                   .replace("- ", "-")     \
+                                   .replace('-"', '"-')    \
+                                   .split('"')
+    # Strip punctuation other than modifiers from terms and create
+    # terms list, first from quoted terms and then remaining words.
+    terms = [("" if t[0:1] not in "+-" else t[0:1]) + t.strip(punctuation)
+        for t in terms[1::2] + "".join(terms[::2]).split()]
+    # Remove stop words from terms that aren't quoted or use
+    # modifiers, since words with these are an explicit part of
+    # the search query. If doing so ends up with an empty term
+    # list, then keep the stop words.
+    terms_no_stopwords = [t for t in terms if t.lower() not in
+        settings.STOP_WORDS]
+    get_positive_terms = lambda terms: [t.lower().strip(punctuation)
+        for t in terms if t[0:1] != "-"]
+    positive_terms = get_positive_terms(terms_no_stopwords)
+    if positive_terms:
+        terms = terms_no_stopwords
+    else:
+        positive_terms = get_positive_terms(terms)
+    return terms, positive_terms
+
+
+def icontains_filter(term, fields):
+    """
+    Returns a ``Q`` matching the term as a substring of any of the
+    given fields.
+    """
+    return reduce(ior, [Q(**{"%s__icontains" % f: term}) for f in fields])
+
+
+class JSONValues(RawSQL):
+    """
+    Subquery selecting the values of a list, passed to SQLite as a
+    single JSON parameter and read back with ``json_each``. Used for
+    ``__in`` lookups, which add the parentheses themselves.
+    """
+
+    def __init__(self, values):
+        super(JSONValues, self).__init__("SELECT value FROM json_each(%s)",
+                                         [json.dumps(list(values))])
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def pk_filter(pks, using):
+    """
+    Returns a ``Q`` matching the given primary keys. On SQLite the
+    keys are passed as one parameter with ``JSONValues``, since one
+    parameter per key soon runs into SQLite's limit on query
+    variables.
+    """
+    if connections[using].vendor == "sqlite":
+        return Q(pk__in=JSONValues(pks))
+    return Q(pk__in=pks)
+
+
+class AgeInSeconds(Func):
+    """
+    Number of seconds between a datetime expression and the given
+    moment, as a float.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, expression, moment, **extra):
+        moment = Value(moment, output_field=DateTimeField())
+        super(AgeInSeconds, self).__init__(moment, expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotImplementedError("AgeInSeconds isn't supported on %s"
+                                  % connection.vendor)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super(AgeInSeconds, self).as_sql(compiler, connection,
+            template="EXTRACT(EPOCH FROM (%(expressions)s))",
+            arg_joiner=" - ", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super(AgeInSeconds, self).as_sql(compiler, connection,
+            template="((JULIANDAY(%(expressions)s)) * 86400.0)",
+            arg_joiner=") - JULIANDAY(", **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super(AgeInSeconds, self).as_sql(compiler, connection,
+            template="(TIMESTAMPDIFF(MICROSECOND, %(expressions)s) / 1000000.0)",
+            arg_joiner=", ", function=None, **extra_context)
+
+
+def search_score_annotations(model, search_fields, terms, name):
+    """
+    Returns a list of annotations, to be applied in order, that score
+    rows the same way search results have always been ranked, with
+    the final score stored under ``name``: the number of occurrences
+    of each term in each local search field, multiplied by the
+    field's weight. Rows without any occurrences score the average
+    weight of the fields spanning relationships, if there are any,
+    since occurrences across relationships can't be counted. The
+    score is then divided by the row's age in seconds raised to
+    ``SEARCH_AGE_SCALE_FACTOR``.
+    """
+    counts = []
+    related_weights = []
+    for field, weight in search_fields.items():
+        if "__" in field:
+            related_weights.append(weight)
+            continue
+        value = Lower(Coalesce(field, Value("")))
+        for term in terms:
+            removed = Length(Replace(value, Value(term), Value("")))
+            counts.append((Length(value) - removed) / len(term) * weight)
+    if counts:
+        score = Cast(sum(counts[1:], counts[0]), FloatField())
+    else:
+        score = Value(0.0, output_field=FloatField())
+    raw, age = "%s_raw" % name, "%s_age" % name
+    annotations = [{raw: score}]
+    if related_weights:
+        average = int(sum(related_weights) / len(related_weights))
+        annotations.append({"%s_related" % name: Case(
+            When(**{raw: 0, "then": Value(float(average))}),
+            default=F(raw), output_field=FloatField())})
+        raw = "%s_related" % name
+    try:
+        model._meta.get_field("publish_date")
+    except FieldDoesNotExist:
+        annotations.append({name: F(raw)})
+        return annotations
+    factor = settings.SEARCH_AGE_SCALE_FACTOR
+    annotations.append({age: AgeInSeconds("publish_date", now())})
+    annotations.append({name: Case(
+        When(**{"%s__gt" % age: 0, "then": F(raw) / Power(F(age), factor)}),
+        default=F(raw), output_field=FloatField())})
+    return annotations
+
+
+class SearchResults(object):
+    """
+    Lazy search results across models, backed by a queryset of
+    ``(pk, content type id, score)`` rows ordered by score. Supports
+    ``count``, ``len`` and slicing, so it can be given to a
+    ``Paginator``. Slicing only fetches the rows in the slice, then
+    loads their instances with one ``in_bulk`` query per model,
+    setting ``result_count`` on each.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.rows.count() if self.rows is not None else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __bool__(self):
+        return self.count() > 0
+
+    def __getitem__(self, k):
+        # Querysets don't support negative indexes, so they're
+        # resolved against the count the way lists resolve them.
+        if not isinstance(k, slice):
+            if k < 0:
+                k += self.count()
+                if k < 0:
+                    raise IndexError("Search result index out of range")
+            try:
+                return self[k:k + 1][0]
+            except IndexError:
+                raise IndexError("Search result index out of range")
+        if self.rows is None:
+            return []
+        if any(i is not None and i < 0 for i in (k.start, k.stop)):
+            start, stop = k.indices(self.count())[:2]
+            if start >= stop:
+                return []
+            k = slice(start, stop, k.step)
+        rows = list(self.rows[k])
+        ids_by_type = defaultdict(list)
+        for pk, content_type_id, score in rows:
+            ids_by_type[content_type_id].append(pk)
+        instances = {}
+        for content_type_id, pks in ids_by_type.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            for pk, instance in model._base_manager.in_bulk(pks).items():
+                instances[(content_type_id, pk)] = instance
+        results = []
+        for pk, content_type_id, score in rows:
+            instance = instances.get((content_type_id, pk))
+            if instance is not None:
+                instance.result_count = score
+                results.append(instance)
+        return results
+
+
+class BaseSearchBackend(object):
+    """
+    Search backends turn a single search term into a ``Q`` object for
+    ``SearchableQuerySet.search``, which combines them according to
+    the ``+``/``-`` modifiers. Backends that keep an index are told
+    about saved and deleted instances via ``update_index`` and
+    ``remove_from_index``.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def term_filter(self, queryset, term, search_fields):
+        return icontains_filter(term, search_fields)
+
+    def update_index(self, instance, update_fields=None):
+        pass
+
+    def remove_from_index(self, instance):
+        pass
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """
+    Matches each term with ``icontains`` against every search field.
+    Needs no index, but scans the whole table for every search.
+    """
+
+
+def vector_fields(model, vector_field="search_vector"):
+    """
+    Returns the search fields of the given model that are stored in
+    its ``tsvector`` column, mapped to their weights: the model's
+    local search fields, or an empty dict if it has no vector.
+    """
+    try:
+        vector_model = model._meta.get_field(vector_field).model
+    except FieldDoesNotExist:
+        return {}
+    local = set(f.name for f in vector_model._meta.concrete_fields)
+    search_fields = vector_model.objects.get_search_fields()
+    return dict((name, weight) for name, weight in search_fields.items()
+                if name in local)
+
+
+def search_vector(indexed):
+    """
+    Returns the ``SearchVector`` stored for the given fields, weighted
+    ``A`` to ``D`` in order of their weights and built with the
+    ``SEARCH_POSTGRES_CONFIG`` text search configuration. Used both
+    when saving and by the migration populating existing rows.
+    """
+    from django.contrib.postgres.search import SearchVector
+    weights = sorted(set(indexed.values()), reverse=True)
+    labels = dict((weight, "ABCD"[min(i, 3)])
+                  for i, weight in enumerate(weights))
+    config = settings.SEARCH_POSTGRES_CONFIG
+    return reduce(add, [SearchVector(name, weight=labels[weight],
+                                     config=config)
+                        for name, weight in sorted(indexed.items())])
+
+
+def prefix_query(term):
+    """
+    Returns a raw ``tsquery`` matching the words of the term as
+    prefixes of words in the vector, following each other when the
+    term is a phrase. Returns ``None`` if the term has no words.
+    """
+    words = tokenize(term.lower())
+    if not words:
+        return None
+    return " <-> ".join("%s:*" % word for word in words)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Matches terms against a stored ``tsvector`` column (see
+    ``Displayable.search_vector``) backed by a GIN index. The vector
+    is built by ``search_vector`` from the model's local search
+    fields, and rebuilt whenever one of those fields is saved. Words
+    match as prefixes of the stemmed words in the vector, so unlike
+    ``icontains`` a term doesn't match from the middle of a word.
+    Search fields spanning relations, and models without the vector
+    column, fall back to ``icontains``.
+    """
+
+    vector_field = "search_vector"
+
+    def __init__(self, *args, **kwargs):
+        super(PostgresSearchBackend, self).__init__(*args, **kwargs)
+        self._indexed_fields = {}
+
+    def indexed_fields(self, model):
+        if model not in self._indexed_fields:
+            self._indexed_fields[model] = vector_fields(model,
+                                                        self.vector_field)
+        return self._indexed_fields[model]
+
+    def term_filter(self, queryset, term, search_fields):
+        from django.contrib.postgres.search import SearchQuery
+        indexed = self.indexed_fields(queryset.model)
+        related = [f for f in search_fields if "__" in f]
+        local = set(search_fields) - set(related)
+        query = prefix_query(term)
+        if not indexed or local != set(indexed) or query is None:
+            return icontains_filter(term, search_fields)
+        query = SearchQuery(query, config=settings.SEARCH_POSTGRES_CONFIG,
+                            search_type="raw")
+        q = Q(**{self.vector_field: query})
+        if related:
+            q |= icontains_filter(term, related)
+        return q
+
+    def update_index(self, instance, update_fields=None):
+        indexed = self.indexed_fields(type(instance))
+        if not indexed:
+            return
+        if update_fields is not None and not set(update_fields) & set(indexed):
+            return
+        vector_model = instance._meta.get_field(self.vector_field).model
+        queryset = vector_model._base_manager.using(self.using)
+        queryset.filter(pk=instance.pk).update(
+            **{self.vector_field: search_vector(indexed)})
+
+
+class InvertedIndex(object):
+    """
+    In-process inverted index over the local search fields of one
+    model. Each field maps tokens to the set of primary keys whose
+    value contains them, and keeps the lowercased value itself for
+    verifying phrases. Each token is also indexed by all of its
+    substrings of up to ``gram_size`` characters.
+
+    A term matches a field if it's a substring of the field's value,
+    the same as ``icontains``: each word is looked up by its grams,
+    which gives the tokens containing it without scanning the
+    vocabulary, and phrases are narrowed down to the rows containing
+    each of their words before being checked against the stored
+    values. Saved and deleted rows are marked dirty and re-read in
+    one query before the next lookup.
+    """
+
+    gram_size = 3
+
+    def __init__(self, model, fields, using):
+        self.model = model
+        self.fields = tuple(fields)
+        self.using = using
+        self.postings = dict((f, defaultdict(set)) for f in self.fields)
+        self.grams = dict((f, defaultdict(set)) for f in self.fields)
+        self.documents = dict((f, {}) for f in self.fields)
+        self.dirty = set()
+        self.built = False
+        self.lock = RLock()
+
+    def queryset(self):
+        return self.model._base_manager.using(self.using)
+
+    def token_grams(self, token):
+        """
+        Returns every substring of the token up to ``gram_size``
+        characters long.
+        """
+        return set(token[i:i + n] for n in range(1, self.gram_size + 1)
+                   for i in range(len(token) - n + 1))
+
+    def add(self, pk, values):
+        for field, value in zip(self.fields, values):
+            if not value:
+                continue
+            text = str(value).lower()
+            self.documents[field][pk] = text
+            postings = self.postings[field]
+            for token in set(tokenize(text)):
+                if token not in postings:
+                    for gram in self.token_grams(token):
+                        self.grams[field][gram].add(token)
+                postings[token].add(pk)
+
+    def discard(self, pk):
+        for field in self.fields:
+            text = self.documents[field].pop(pk, None)
+            if not text:
+                continue
+            postings = self.postings[field]
+            grams = self.grams[field]
+            for token in set(tokenize(text)):
+                postings[token].discard(pk)
+                if postings[token]:
+                    continue
+                del postings[token]
+                for gram in self.token_grams(token):
+                    grams[gram].discard(token)
+                    if not grams[gram]:
+                        del grams[gram]
+
+    def tokens_containing(self, field, word):
+        """
+        Returns the tokens in the field's vocabulary that contain the
+        word. Words up to ``gram_size`` long are grams themselves, and
+        longer words are narrowed down to the tokens sharing all of
+        their grams of that size.
+        """
+        grams = self.grams[field]
+        n = self.gram_size
+        if len(word) <= n:
+            return grams.get(word, ())
+        candidates = sorted((grams.get(word[i:i + n], set())
+                             for i in range(len(word) - n + 1)), key=len)
+        tokens = candidates[0].intersection(*candidates[1:])
+        return [token for token in tokens if word in token]
+
+    def mark_dirty(self, pk):
+        with self.lock:
+            if self.built:
+                self.dirty.add(pk)
+
+    def refresh(self):
+        """
+        Build the index on first use, then re-read dirty rows.
+        """
+        if not self.built:
+            rows = self.queryset().values_list("pk", *self.fields)
+            for row in rows.iterator():
+                self.add(row[0], row[1:])
+            self.built = True
+        elif self.dirty:
+            dirty, self.dirty = self.dirty, set()
+            for pk in dirty:
+                self.discard(pk)
+            rows = self.queryset().filter(pk__in=dirty)
+            for row in rows.values_list("pk", *self.fields):
+                self.add(row[0], row[1:])
+
+    def lookup(self, term, fields):
+        """
+        Returns the primary keys of rows where any of the given fields
+        contains the term.
+        """
+        term = term.lower()
+        words = tokenize(term)
+        matches = set()
+        with self.lock:
+            self.refresh()
+            for field in fields:
+                postings = self.postings[field]
+                documents = self.documents[field]
+                if not words:
+                    matches.update(pk for pk, text in documents.items()
+                                   if term in text)
+                    continue
+                candidates = None
+                for word in words:
+                    found = set()
+                    for token in self.tokens_containing(field, word):
+                        found |= postings[token]
+                    candidates = found if candidates is None else candidates & found
+                    if not candidates:
+                        break
+                if not candidates:
+                    continue
+                if words != [term]:
+                    candidates = set(pk for pk in candidates
+                                     if term in documents[pk])
+                matches |= candidates
+        return matches
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    Keeps an ``InvertedIndex`` per model in process memory. Intended
+    for SQLite and development, where there's no full-text index in
+    the database. Changes made with ``QuerySet.update`` or in other
+    processes aren't seen by the index.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(InvertedIndexSearchBackend, self).__init__(*args, **kwargs)
+        self.indexes = {}
+        self.lock = RLock()
+
+    def get_index(self, model):
+        with self.lock:
+            if model not in self.indexes:
+                local = set(f.name for f in model._meta.concrete_fields)
+                try:
+                    search_fields = model.objects.get_search_fields()
+                except AttributeError:
+                    search_fields = {}
+                fields = [f for f in search_fields if f in local]
+                self.indexes[model] = InvertedIndex(model, fields, self.using)
+            return self.indexes[model]
+
+    def term_filter(self, queryset, term, search_fields):
+        index = self.get_index(queryset.model)
+        indexed = [f for f in search_fields if f in index.fields]
+        others = [f for f in search_fields if f not in index.fields]
+        if indexed:
+            q = pk_filter(index.lookup(term, indexed), queryset.db)
+        else:
+            q = Q(pk__in=[])
+        if others:
+            q |= icontains_filter(term, others)
+        return q
+
+    def update_index(self, instance, update_fields=None):
+        for model, index in list(self.indexes.items()):
+            if isinstance(instance, model) or issubclass(model, type(instance)):
+                index.mark_dirty(instance.pk)
+
+    remove_from_index = update_index
+
+
+_backends = {}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """
+    Returns the search backend for the given database alias. The
+    ``SEARCH_BACKEND`` setting can name a backend class by dotted
+    path, otherwise PostgreSQL databases use ``PostgresSearchBackend``
+    and everything else uses ``InvertedIndexSearchBackend``.
+    """
+    if using not in _backends:
+        if settings.SEARCH_BACKEND:
+            backend_class = import_dotted_path(settings.SEARCH_BACKEND)
+        elif connections[using].vendor == "postgresql":
+            backend_class = PostgresSearchBackend
+        else:
+            backend_class = InvertedIndexSearchBackend
+        _backends[using] = backend_class(using=using)
+    return _backends[using]
+
+
+def is_searchable(model):
+    manager = getattr(model, "objects", None)
+    return getattr(manager, "get_search_fields", None) is not None
+
+
+def update_index(sender, instance, **kwargs):
+    if not is_searchable(sender):
+        return
+    using = kwargs.get("using") or DEFAULT_DB_ALIAS
+    backend = get_search_backend(using)
+    backend.update_index(instance, update_fields=kwargs.get("update_fields"))
+
+
+def remove_from_index(sender, instance, **kwargs):
+    if not is_searchable(sender):
+        return
+    using = kwargs.get("using") or DEFAULT_DB_ALIAS
+    get_search_backend(using).remove_from_index(instance)
+
+
+post_save.connect(update_index, dispatch_uid="simplifytour_search_update")
+post_delete.connect(remove_from_index, dispatch_uid="simplifytour_search_remove")
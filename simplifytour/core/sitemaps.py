@@ -0,0 +1,178 @@
+from tempfile import TemporaryFile
+from time import time
+from xml.sax.saxutils import escape
+
+from django.apps import apps
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.urls import NoReverseMatch
+from django.conf import settings
+
+from simplifytour.core.models import Displayable
+from simplifytour.utils.urls import home_slug
+
+
+SITEMAP_GENERATION_CACHE_KEY = "simplifytour.core.sitemaps.generation"
+
+SITEMAP_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<%s xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+
+
+def sitemap_path(generation, section=None):
+    """
+    Returns the storage path of the sitemap index written by the given
+    generation of ``write_sitemaps``, or of one of the sitemap files it
+    lists when ``section`` is given.
+    """
+    if section is None:
+        name = "sitemap.xml"
+    else:
+        name = "sitemap-%s.xml" % section
+    return "%s/%s/%s" % (settings.SITEMAP_DIR_NAME, generation, name)
+
+
+def sitemap_generations():
+    """
+    Returns the generations of sitemap files in ``default_storage``,
+    oldest first, including any left incomplete by a failed run.
+    """
+    try:
+        directories = default_storage.listdir(settings.SITEMAP_DIR_NAME)[0]
+    except (IOError, OSError):
+        return []
+    return sorted(int(name) for name in directories if name.isdigit())
+
+
+def current_sitemap_generation():
+    """
+    Returns the generation of the sitemap currently served, as switched
+    to by ``write_sitemaps`` once all of its files were written. If the
+    cache has lost it, the newest generation with an index is used.
+    """
+    generation = cache.get(SITEMAP_GENERATION_CACHE_KEY)
+    if generation is None:
+        for generation in reversed(sitemap_generations()):
+            if default_storage.exists(sitemap_path(generation)):
+                cache.add(SITEMAP_GENERATION_CACHE_KEY, generation, None)
+                break
+        else:
+            return None
+    return generation
+
+
+def sitemap_items():
+    """
+    Streaming version of ``DisplayableManager.url_map``. Yields the
+    published instances of each concrete ``Displayable`` subclass that
+    are shown in the sitemap, fetched in chunks of
+    ``SITEMAP_CHUNK_SIZE`` rows instead of loaded into memory at once.
+    Subclasses using multi-table inheritance are covered by their
+    concrete parent, so each row is only yielded once.
+    """
+    for model in apps.get_models():
+        if not issubclass(model, Displayable) or model._meta.proxy:
+            continue
+        if any(issubclass(parent, Displayable)
+               for parent in model._meta.get_parent_list()):
+            continue
+        items = (model.objects.published()
+                 .filter(in_sitemap=True)
+                 .exclude(slug__startswith="http://")
+                 .exclude(slug__startswith="https://")
+                 .order_by("pk"))
+        for item in items.iterator(chunk_size=settings.SITEMAP_CHUNK_SIZE):
+            yield item
+
+
+def sitemap_urls():
+    """
+    Yields the path and last modified date of every URL for the
+    sitemap, starting with the homepage. Items whose model doesn't
+    define ``get_absolute_url`` use their content model's, via
+    ``get_content_model``, and are skipped if neither has one.
+    """
+    try:
+        yield home_slug(), None
+    except NoReverseMatch:
+        pass
+    skipped = set()
+    for item in sitemap_items():
+        if item.__class__ in skipped:
+            continue
+        try:
+            url = item.get_absolute_url()
+        except NotImplementedError:
+            if not hasattr(item, "get_content_model"):
+                skipped.add(item.__class__)
+                continue
+            content = item.get_content_model()
+            try:
+                url = content.get_absolute_url()
+            except (AttributeError, NotImplementedError):
+                continue
+        yield url, item.updated
+
+
+def _save(name, f):
+    f.seek(0)
+    default_storage.save(name, File(f))
+
+
+def _delete_generation(generation):
+    directory = "%s/%s" % (settings.SITEMAP_DIR_NAME, generation)
+    for name in default_storage.listdir(directory)[1]:
+        default_storage.delete("%s/%s" % (directory, name))
+    default_storage.delete(directory)
+
+
+def write_sitemaps():
+    """
+    Writes the sitemap for the current site to ``default_storage``,
+    split into files of at most ``SITEMAP_PAGE_SIZE`` URLs, followed
+    by the index listing them. Each run writes a new generation of
+    files and only switches the ``sitemap`` view over to it once the
+    index is written, so the sitemap is never missing or partly
+    written while crawlers read it. The previous generation is kept
+    for requests still reading it, and older ones are removed.
+    Returns the number of sitemap files written.
+    """
+    generation = max([int(time() * 1000)] +
+                     [g + 1 for g in sitemap_generations()])
+    root = "%s://%s" % (settings.SITEMAP_PROTOCOL,
+                        Site.objects.get_current().domain)
+    sections = 0
+    f = None
+    for count, (url, lastmod) in enumerate(sitemap_urls()):
+        if count % settings.SITEMAP_PAGE_SIZE == 0:
+            if f is not None:
+                f.write(b"</urlset>\n")
+                _save(sitemap_path(generation, sections), f)
+                f.close()
+            sections += 1
+            f = TemporaryFile()
+            f.write((SITEMAP_HEADER % "urlset").encode("utf-8"))
+        entry = "<url><loc>%s</loc>" % escape(root + url)
+        if lastmod:
+            entry += "<lastmod>%s</lastmod>" % lastmod.date().isoformat()
+        f.write(("%s</url>\n" % entry).encode("utf-8"))
+    if f is not None:
+        f.write(b"</urlset>\n")
+        _save(sitemap_path(generation, sections), f)
+        f.close()
+
+    with TemporaryFile() as f:
+        f.write((SITEMAP_HEADER % "sitemapindex").encode("utf-8"))
+        for section in range(1, sections + 1):
+            loc = "%s/sitemap-%s.xml" % (root, section)
+            f.write(("<sitemap><loc>%s</loc></sitemap>\n" %
+                     escape(loc)).encode("utf-8"))
+        f.write(b"</sitemapindex>\n")
+        _save(sitemap_path(generation), f)
+
+    cache.set(SITEMAP_GENERATION_CACHE_KEY, generation, None)
+    older = [g for g in sitemap_generations() if g < generation]
+    for old in older[:-1]:
+        _delete_generation(old)
+    return sections
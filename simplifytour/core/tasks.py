@@ -0,0 +1,23 @@
+from config import celery_app
+
+from simplifytour.core import sitemaps, thumbnails
+
+
+@celery_app.task()
+def generate_thumbnail(image_url, width, height, upscale=True, quality=95,
+                       left=.5, top=.5, padding=False, padding_color="#fff"):
+    """
+    Generates a thumbnail queued by the ``thumbnail`` template tag when
+    ``THUMBNAILS_ASYNC`` is enabled.
+    """
+    return thumbnails.generate_thumbnail(
+        image_url, width, height, upscale=upscale, quality=quality,
+        left=left, top=top, padding=padding, padding_color=padding_color)
+
+
+@celery_app.task()
+def generate_sitemaps():
+    """
+    Regenerates the sitemap files served by the ``sitemap`` view.
+    """
+    return sitemaps.write_sitemaps()
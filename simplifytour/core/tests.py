@@ -0,0 +1,345 @@
+import json
+import os
+from io import BytesIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock, skipUnless
+from urllib.parse import unquote
+
+from django.contrib.admin import AdminSite
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.forms import inlineformset_factory
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from simplifytour.core import search, sitemaps, thumbnails
+from simplifytour.core.admin import DisplayableAdmin
+from simplifytour.core.file_upload.views import FileUploadGraphQLView
+from simplifytour.core.views import sitemap
+from simplifytour.packages.models import (AdventurousPackage, ItineraryItem,
+                                          Package, PackageItinerary,
+                                          TrekPackage)
+
+
+class SearchBackendTests(TestCase):
+
+    backends = ["simplifytour.core.search.IcontainsSearchBackend",
+                "simplifytour.core.search.InvertedIndexSearchBackend"]
+
+    def setUp(self):
+        search._backends.clear()
+        self.addCleanup(search._backends.clear)
+        self.user = get_user_model().objects.create(
+            email="guide@example.com")
+        for title in ("Annapurna Circuit Trek", "Everest Base Camp Trek",
+                      "Annapurna Base Camp"):
+            self.create_package(title)
+
+    def create_package(self, title):
+        return Package.objects.create(title=title, content="",
+                                      provided_by=self.user, site_id=1)
+
+    def search(self, query):
+        results = Package.objects.all().search(query, search_fields=["title"])
+        return set(results.values_list("title", flat=True))
+
+    def test_modifiers_and_phrases(self):
+        queries = {
+            "annapurna": {"Annapurna Circuit Trek", "Annapurna Base Camp"},
+            "purn": {"Annapurna Circuit Trek", "Annapurna Base Camp"},
+            "circuit everest": {"Annapurna Circuit Trek",
+                                "Everest Base Camp Trek"},
+            "+trek -everest": {"Annapurna Circuit Trek"},
+            "+annapurna +camp": {"Annapurna Base Camp"},
+            "-circuit annapurna": {"Annapurna Base Camp"},
+            '"base camp"': {"Everest Base Camp Trek", "Annapurna Base Camp"},
+            '"camp base"': set(),
+            '+"base camp" -"camp trek"': {"Annapurna Base Camp"},
+            "kathmandu": set(),
+        }
+        for backend in self.backends:
+            with override_settings(SEARCH_BACKEND=backend):
+                search._backends.clear()
+                for query, titles in queries.items():
+                    with self.subTest(backend=backend, query=query):
+                        self.assertEqual(self.search(query), titles)
+
+    @override_settings(
+        SEARCH_BACKEND="simplifytour.core.search.InvertedIndexSearchBackend")
+    def test_index_follows_changes(self):
+        self.assertEqual(self.search("circuit"), {"Annapurna Circuit Trek"})
+        package = Package.objects.get(title="Annapurna Base Camp")
+        package.title = "Annapurna Sanctuary"
+        package.save()
+        self.assertEqual(self.search("sanct"), {"Annapurna Sanctuary"})
+        self.assertEqual(self.search("base"), {"Everest Base Camp Trek"})
+        package.delete()
+        self.assertEqual(self.search("annapurna"), {"Annapurna Circuit Trek"})
+
+    @override_settings(
+        SEARCH_BACKEND="simplifytour.core.search.InvertedIndexSearchBackend")
+    def test_matches_use_one_parameter(self):
+        """
+        Matching rows aren't passed to the database as one parameter
+        each, which would run into SQLite's variable limit.
+        """
+        for i in range(50):
+            self.create_package("Langtang Trek %s" % i)
+        results = Package.objects.all().search("trek", search_fields=["title"])
+        sql, params = results.query.sql_with_params()
+        self.assertEqual(results.count(), 52)
+        self.assertLess(len(params), 5)
+
+
+@skipUnless(connection.vendor == "postgresql", "Needs PostgreSQL")
+@override_settings(
+    SEARCH_BACKEND="simplifytour.core.search.PostgresSearchBackend")
+class PostgresSearchBackendTests(TestCase):
+
+    def setUp(self):
+        search._backends.clear()
+        self.addCleanup(search._backends.clear)
+        user = get_user_model().objects.create(email="guide@example.com")
+        for title, keywords in (("Annapurna Circuit Trek", ""),
+                                ("Everest Base Camp Trek", "khumbu glacier"),
+                                ("Annapurna Base Camp", "")):
+            Package.objects.create(title=title, keywords_string=keywords,
+                                   content="", provided_by=user, site_id=1)
+
+    def search(self, query):
+        fields = ["keywords_string", "title"]
+        results = Package.objects.all().search(query, search_fields=fields)
+        return set(results.values_list("title", flat=True))
+
+    def test_modifiers_and_phrases(self):
+        # Words match from their start, so "purn" isn't found.
+        queries = {
+            "annapurna": {"Annapurna Circuit Trek", "Annapurna Base Camp"},
+            "annap": {"Annapurna Circuit Trek", "Annapurna Base Camp"},
+            "purn": set(),
+            "khumbu": {"Everest Base Camp Trek"},
+            "circuit everest": {"Annapurna Circuit Trek",
+                                "Everest Base Camp Trek"},
+            "+trek -everest": {"Annapurna Circuit Trek"},
+            "+annapurna +camp": {"Annapurna Base Camp"},
+            '"base camp"': {"Everest Base Camp Trek", "Annapurna Base Camp"},
+            '"camp base"': set(),
+            '+"base camp" -"camp trek"': {"Annapurna Base Camp"},
+        }
+        for query, titles in queries.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), titles)
+
+    def test_index_follows_changes(self):
+        package = Package.objects.get(title="Annapurna Base Camp")
+        package.title = "Annapurna Sanctuary"
+        package.save()
+        self.assertEqual(self.search("sanct"), {"Annapurna Sanctuary"})
+        self.assertEqual(self.search("base"), {"Everest Base Camp Trek"})
+
+
+class SearchResultsTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create(email="guide@example.com")
+        for model, title in ((TrekPackage, "Langtang Trek"),
+                             (TrekPackage, "Manaslu Trek Trek"),
+                             (AdventurousPackage, "Rafting Trek Trek Trek")):
+            model.objects.create(title=title, content="", provided_by=user,
+                                 site_id=1)
+
+    def test_negative_indexes(self):
+        results = Package.objects.search_results("trek",
+                                                 search_fields=["title"])
+        titles = [package.title for package in results]
+        self.assertEqual(len(titles), 3)
+        self.assertEqual(results[-1].title, titles[-1])
+        self.assertEqual(results[-3].title, titles[0])
+        with self.assertRaises(IndexError):
+            results[-4]
+        for k in (slice(-1, None), slice(None, -1), slice(-2, -1),
+                  slice(-5, -4), slice(-1, -2)):
+            with self.subTest(k=k):
+                self.assertEqual([r.title for r in results[k]], titles[k])
+        results = search.SearchResults(None)
+        with self.assertRaises(IndexError):
+            results[-1]
+        self.assertEqual(results[-1:], [])
+
+
+class UniqueSlugTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="guide@example.com")
+
+    def create_package(self, title):
+        return Package.objects.create(title=title, content="",
+                                      provided_by=self.user, site_id=1)
+
+    def test_suffixes(self):
+        slugs = [self.create_package(title).slug for title in
+                 ("Everest", "Everest", "Everest 1", "Everest", "Everest 1")]
+        self.assertEqual(slugs, ["everest", "everest-1", "everest-1-1",
+                                 "everest-2", "everest-1-2"])
+
+
+class SitemapTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media_root = mkdtemp()
+        self.addCleanup(rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root,
+                                     SITEMAP_PAGE_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        user = get_user_model().objects.create(email="guide@example.com")
+        for model, title in ((Package, "Annapurna Circuit"),
+                             (TrekPackage, "Everest Base Camp"),
+                             (AdventurousPackage, "Langtang")):
+            model.objects.create(title=title, content="", provided_by=user,
+                                 site_id=1)
+
+    def get(self, section=None):
+        response = sitemap(RequestFactory().get("/"), section)
+        if response.status_code != 200:
+            return None
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_generations(self):
+        self.assertIsNone(self.get())
+        sections = sitemaps.write_sitemaps()
+        index, first = self.get(), self.get(1)
+        self.assertEqual(index.count("<sitemap>"), sections)
+        self.assertIn("/sitemap-%s.xml" % sections, index)
+        urls = first + self.get(2)
+        for slug in ("annapurna-circuit", "everest-base-camp", "langtang"):
+            self.assertEqual(urls.count("/packages/%s/</loc>" % slug), 1)
+        self.assertIsNone(self.get(sections + 1))
+        # Rewriting never removes the files being served, and only the
+        # generation before the current one is kept.
+        for i in range(3):
+            sitemaps.write_sitemaps()
+            self.assertEqual(self.get(), index)
+        self.assertEqual(len(sitemaps.sitemap_generations()), 2)
+        cache.clear()
+        self.assertEqual(self.get(1), first)
+
+
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = mkdtemp()
+        self.addCleanup(rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root,
+                                     MEDIA_URL="/media/")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.image_url = default_storage.save("photos/everest.png",
+                                              self.image((20, 10)))
+
+    def image(self, size):
+        data = BytesIO()
+        Image.new("RGB", size).save(data, "PNG")
+        return ContentFile(data.getvalue())
+
+    def thumbnail_path(self, thumb_url):
+        return os.path.join(self.media_root, unquote(thumb_url))
+
+    def test_removed_thumbnails_regenerated(self):
+        thumb_url = thumbnails.generate_thumbnail(self.image_url, 4, 2)
+        self.assertNotEqual(thumb_url, self.image_url)
+        self.assertTrue(thumbnails.in_manifest(self.image_url, thumb_url))
+        thumbnails.remove_thumbnails(self.image_url)
+        self.assertFalse(os.path.exists(self.thumbnail_path(thumb_url)))
+        self.assertFalse(thumbnails.in_manifest(self.image_url, thumb_url))
+        self.assertEqual(thumbnails.generate_thumbnail(self.image_url, 4, 2),
+                         thumb_url)
+        with Image.open(self.thumbnail_path(thumb_url)) as thumbnail:
+            self.assertEqual(thumbnail.size, (4, 2))
+
+
+class OrderableAdminTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create(email="guide@example.com")
+        self.package = Package.objects.create(title="Annapurna Circuit",
+                                              content="", provided_by=user,
+                                              site_id=1)
+        self.itinerary = [PackageItinerary.objects.create(
+            package=self.package, _order=i, item=ItineraryItem.objects.create(
+                title="Day %s" % i, description="", provided_by=user))
+            for i in range(3)]
+
+    def test_reorder_inlines(self):
+        FormSet = inlineformset_factory(Package, PackageItinerary,
+                                        fields=("item", "_order"), extra=0)
+        prefix = FormSet.get_default_prefix()
+        data = {"%s-TOTAL_FORMS" % prefix: 3,
+                "%s-INITIAL_FORMS" % prefix: 3}
+        for i, (row, order) in enumerate(zip(self.itinerary, (2, 0, 1))):
+            data.update({"%s-%s-id" % (prefix, i): row.pk,
+                         "%s-%s-package" % (prefix, i): self.package.pk,
+                         "%s-%s-item" % (prefix, i): row.item_id,
+                         "%s-%s-_order" % (prefix, i): order})
+        formset = FormSet(data, instance=self.package)
+        self.assertTrue(formset.is_valid())
+        model_admin = DisplayableAdmin(Package, AdminSite())
+        request = RequestFactory().post("/")
+        with CaptureQueriesContext(connection) as queries:
+            model_admin.save_formset(request, None, formset, True)
+        updates = [q["sql"] for q in queries.captured_queries if
+                   q["sql"].startswith('UPDATE "packages_packageitinerary"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(list(PackageItinerary.objects.order_by(
+            "_order").values_list("pk", flat=True)),
+            [self.itinerary[i].pk for i in (1, 2, 0)])
+        # The forms are left as they were, for the change message.
+        self.assertEqual([f.changed_data for f in formset.forms],
+                         [["_order"]] * 3)
+        self.assertEqual(len(formset.changed_objects), 3)
+
+
+@override_settings(GRAPHQL_UPLOAD_MAX_SIZE=1000)
+class UploadQuotaTests(TestCase):
+
+    def upload(self, size):
+        return self.client.post("/graphql", {
+            "operations": json.dumps({"query": "{ __typename }",
+                                      "variables": {"file": None}}),
+            "map": json.dumps({"0": ["variables.file"]}),
+            "0": SimpleUploadedFile("photo.jpg", b"x" * size),
+        })
+
+    def assertTooLarge(self, response):
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(json.loads(response.content.decode())["errors"],
+                         [{"message": "Uploads are limited to 1000 bytes "
+                                      "per request."}])
+
+    def test_under_quota(self):
+        response = self.upload(100)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode())["data"],
+                         {"__typename": "Query"})
+
+    def test_content_length_over_quota(self):
+        self.assertTooLarge(self.upload(2000))
+
+    def test_body_over_quota(self):
+        """
+        The upload is stopped once the data read goes over the quota,
+        even if the Content-Length header didn't say so.
+        """
+        with mock.patch.object(FileUploadGraphQLView, "upload_too_large",
+                               return_value=False):
+            self.assertTooLarge(self.upload(2000))
+
@@ -6,6 +6,8 @@ from django.utils.text import slugify
 
 from graphql_relay.node.node import from_global_id
 
+from simplifytour.utils.urls import lock_slug
+
 
 def token_generator():
     return ''.join(random.SystemRandom().choice(string.ascii_lowercase + string.digits) for _ in range(9))
@@ -20,6 +22,10 @@ def create_slug(instance, value, slug_field_name='slug', queryset=None, slug_sep
 
     ``queryset`` usually doesn't need to be explicitly provided - it'll default
     to using the ``.all()`` queryset from the model's default manager.
+
+    As with ``unique_slug``, slugs are locked on PostgreSQL until the
+    transaction ends, so the instance should be saved in the same
+    transaction.
     """
     slug_field = instance._meta.get_field(slug_field_name)
 
@@ -41,16 +47,33 @@ def create_slug(instance, value, slug_field_name='slug', queryset=None, slug_sep
         queryset = queryset.exclude(pk=instance.pk)
 
     # Find a unique slug. If one matches, at '-2' to the end and try again
-    # (then '-3', etc).
+    # (then '-3', etc). Every slug the candidates could collide with is
+    # fetched up front with a single prefix query - a candidate's base is
+    # only ever cut short to make room for a suffix of up to 10 digits.
+    # A suffixed slug is locked and checked again before it's used, since
+    # another transaction may be saving it as its own unsuffixed slug.
+    lock_slug(queryset.model, original_slug, using=queryset.db)
+    prefix = original_slug
+    if slug_len:
+        prefix = _slug_strip(prefix[:max(slug_len - 11, 0)], slug_separator)
+    taken = set(queryset.filter(**{"%s__startswith" % slug_field_name: prefix})
+                        .values_list(slug_field_name, flat=True))
     next = 2
-    while not slug or queryset.filter(**{slug_field_name: slug}):
-        slug = original_slug
-        end = '%s%s' % (slug_separator, next)
-        if slug_len and len(slug) + len(end) > slug_len:
-            slug = slug[:slug_len-len(end)]
-            slug = _slug_strip(slug, slug_separator)
-        slug = '%s%s' % (slug, end)
-        next += 1
+    while True:
+        while not slug or slug in taken:
+            slug = original_slug
+            end = '%s%s' % (slug_separator, next)
+            if slug_len and len(slug) + len(end) > slug_len:
+                slug = slug[:slug_len-len(end)]
+                slug = _slug_strip(slug, slug_separator)
+            slug = '%s%s' % (slug, end)
+            next += 1
+        if slug == original_slug:
+            break
+        lock_slug(queryset.model, slug, using=queryset.db)
+        if not queryset.filter(**{slug_field_name: slug}).exists():
+            break
+        taken.add(slug)
 
     setattr(instance, slug_field.attname, slug)
 
@@ -8,11 +8,13 @@ except ImportError:
 from json import dumps
 
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import (HttpResponse, HttpResponseNotFound)
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotFound
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.staticfiles import finders
 
 from simplifytour.core.models import Displayable
+from simplifytour.core.sitemaps import current_sitemap_generation, sitemap_path
 from simplifytour.conf import settings
 
 
@@ -83,4 +85,20 @@ def displayable_links_js(request):
             title = "%s: %s" % (verbose_name, title)
         links.append((not page and real, {"title": str(title), "value": url}))
     sorted_links = sorted(links, key=lambda link: (link[0], link[1]['value']))
-    return HttpResponse(dumps([link[1] for link in sorted_links]))
\ No newline at end of file
+    return HttpResponse(dumps([link[1] for link in sorted_links]))
+
+
+def sitemap(request, section=None):
+    """
+    Serves the sitemap index, or one of the sitemap files it lists,
+    as last written by the ``generate_sitemaps`` task, so crawlers
+    never cause the sitemap to be built in a web process.
+    """
+    generation = current_sitemap_generation()
+    if generation is None:
+        return HttpResponseNotFound()
+    try:
+        f = default_storage.open(sitemap_path(generation, section))
+    except (IOError, OSError):
+        return HttpResponseNotFound()
+    return FileResponse(f, content_type="application/xml")
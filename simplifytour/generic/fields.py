@@ -1,10 +1,18 @@
+from collections import defaultdict
+from contextlib import contextmanager
 from copy import copy
+from threading import local
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, AppRegistryNotReady
-from django.db.models import CharField, IntegerField, FloatField
+from django.db.models import (Case, CharField, F, IntegerField, FloatField,
+                              Value, When)
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.contrib.contenttypes.fields import GenericRelation
 from django.db.models.signals import post_save, post_delete
 
+from simplifytour.utils.transaction import CommitBatch
+
 
 def get_related_model(field):
     """
@@ -16,6 +24,35 @@ def get_related_model(field):
         pass
 
 
+_suspended = local()
+
+
+class DirtyRelatedItems(CommitBatch):
+    """
+    Collects the objects whose related items changed during a
+    transaction, as ``(field, content type id, object pk)`` items, so
+    that ``related_items_changed`` is called once per object when the
+    transaction commits, or handed to the
+    ``simplifytour.generic.tasks.related_items_changed`` task when
+    ``GENERIC_RELATIONS_ASYNC`` is ``True``.
+    """
+
+    def process(self, items):
+        from simplifytour.generic.tasks import related_items_changed
+        fields = defaultdict(lambda: defaultdict(set))
+        for field, content_type_id, object_pk in items:
+            fields[field][content_type_id].add(object_pk)
+        for field, content_types in fields.items():
+            for content_type_id, object_pks in content_types.items():
+                if settings.GENERIC_RELATIONS_ASYNC:
+                    related_items_changed.delay(
+                        field.model._meta.label, field.name,
+                        content_type_id, list(object_pks))
+                else:
+                    field.process_related_items_changed(
+                        content_type_id, object_pks)
+
+
 class BaseGenericRelation(GenericRelation):
     """
     Extends ``GenericRelation`` to:
@@ -96,22 +133,54 @@ class BaseGenericRelation(GenericRelation):
     def _related_items_changed(self, **kwargs):
         """
         Ensure that the given related item is actually for the model
-        this field applies to, and pass the instance to the real
-        ``related_items_changed`` handler.
+        this field applies to, and mark the instance as dirty so that
+        the real ``related_items_changed`` handler is called once for
+        it when the current transaction commits.
         """
-        for_model = kwargs["instance"].content_type.model_class()
+        if self in getattr(_suspended, "fields", ()):
+            return
+        if getattr(self, "mti_inherited", False):
+            # Copy of the field on a multi-table subclass - the parent
+            # model's field already handles items for subclasses.
+            return
+        item = kwargs["instance"]
+        for_model = item.content_type.model_class()
         if for_model and issubclass(for_model, self.model):
-            instance_id = kwargs["instance"].object_pk
-            try:
-                instance = for_model.objects.get(id=instance_id)
-            except self.model.DoesNotExist:
-                # Instance itself was deleted - signals are irrelevant.
-                return
+            DirtyRelatedItems.queue((self, item.content_type_id,
+                                     item.object_pk), using=kwargs["using"])
+
+    def process_related_items_changed(self, content_type_id, object_pks):
+        """
+        Loads the instances of the given content type and pass each
+        of them to ``related_items_changed``.
+        """
+        from django.contrib.contenttypes.models import ContentType
+        for_model = ContentType.objects.get_for_id(
+            content_type_id).model_class()
+        if not for_model:
+            return
+        for instance in for_model._base_manager.filter(pk__in=object_pks):
             if hasattr(instance, "get_content_model"):
-                instance = instance.get_content_model()
+                instance = instance.get_content_model() or instance
             related_manager = getattr(instance, self.related_field_name)
             self.related_items_changed(instance, related_manager)
 
+    @contextmanager
+    def suspend_related_items_changed(self):
+        """
+        Ignore related item save and delete signals for this field in
+        the current thread, so that a batch of changes can be followed
+        by a single call to ``related_items_changed``.
+        """
+        fields = getattr(_suspended, "fields", None)
+        if fields is None:
+            fields = _suspended.fields = set()
+        fields.add(self)
+        try:
+            yield
+        finally:
+            fields.discard(self)
+
     def related_items_changed(self, instance, related_manager):
         """
         Can be implemented by subclasses - called whenever the
@@ -168,18 +237,43 @@ class KeywordsField(BaseGenericRelation):
         """
         from simplifytour.generic.models import Keyword
         related_manager = getattr(instance, self.name)
-        # Get a list of Keyword IDs being removed.
-        old_ids = [str(a.keyword_id) for a in related_manager.all()]
-        new_ids = data.split(",")
-        removed_ids = set(old_ids) - set(new_ids)
-        # Remove current AssignedKeyword instances.
-        related_manager.all().delete()
-        # Convert the data into AssignedKeyword instances.
-        if data:
-            data = [related_manager.create(keyword_id=i) for i in new_ids]
+        assigned = {str(a.keyword_id): a for a in related_manager.all()}
+        new_ids = []
+        for keyword_id in data.split(","):
+            if keyword_id and keyword_id not in new_ids:
+                new_ids.append(keyword_id)
+        removed_ids = set(assigned) - set(new_ids)
+        # Apply the difference with one delete, one insert and one
+        # reorder, rather than re-creating every AssignedKeyword and
+        # recalculating the keywords string for each of them.
+        with self.suspend_related_items_changed():
+            if removed_ids:
+                related_manager.filter(keyword_id__in=removed_ids).delete()
+            added = []
+            reordered = {}
+            for order, keyword_id in enumerate(new_ids):
+                if keyword_id not in assigned:
+                    added.append(related_manager.model(**{
+                        "keyword_id": keyword_id,
+                        "_order": order,
+                        related_manager.content_type_field_name:
+                            related_manager.content_type,
+                        related_manager.object_id_field_name:
+                            related_manager.pk_val,
+                    }))
+                elif assigned[keyword_id]._order != order:
+                    reordered[assigned[keyword_id].pk] = order
+            if added:
+                related_manager.model.objects.bulk_create(added)
+            if reordered:
+                related_manager.filter(pk__in=reordered).update(_order=Case(
+                    *[When(pk=pk, then=Value(order))
+                      for pk, order in reordered.items()],
+                    output_field=IntegerField()))
         # Remove keywords that are no longer assigned to anything.
-        Keyword.objects.delete_unused(removed_ids)
-        super(KeywordsField, self).save_form_data(instance, data)
+        if removed_ids:
+            Keyword.objects.delete_unused(removed_ids)
+        self.related_items_changed(instance, related_manager)
 
     def contribute_to_class(self, cls, name):
         """
@@ -213,7 +307,7 @@ class KeywordsField(BaseGenericRelation):
                             self.related_field_name
         if getattr(instance, string_field_name) != keywords:
             setattr(instance, string_field_name, keywords)
-            instance.save()
+            instance.save(update_fields=[string_field_name])
 
 
 class RatingField(BaseGenericRelation):
@@ -228,6 +322,52 @@ class RatingField(BaseGenericRelation):
               "%s_sum": IntegerField(default=0, editable=False),
               "%s_average": FloatField(default=0, editable=False)}
 
+    def _related_items_changed(self, **kwargs):
+        """
+        Apply the change in count and sum caused by the saved or
+        deleted rating to the rated object with a single ``UPDATE``,
+        rather than loading the object and all of its ratings. Falls
+        back to recalculating the totals on commit when the previous
+        value of an edited rating isn't known.
+        """
+        if self in getattr(_suspended, "fields", ()):
+            return
+        if getattr(self, "mti_inherited", False):
+            # Copy of the field on a multi-table subclass - the parent
+            # model's field already handles ratings for subclasses.
+            return
+        rating = kwargs["instance"]
+        for_model = rating.content_type.model_class()
+        if not for_model or not issubclass(for_model, self.model):
+            return
+        if kwargs.get("signal") is post_delete:
+            count, _sum = -1, -rating.value
+        elif kwargs.get("created"):
+            count, _sum = 1, rating.value
+        elif getattr(rating, "_loaded_value", None) is not None:
+            count, _sum = 0, int(rating.value) - int(rating._loaded_value)
+        else:
+            super(RatingField, self)._related_items_changed(**kwargs)
+            return
+        if count or _sum:
+            self.update_totals(rating.object_pk, count, _sum)
+
+    def update_totals(self, object_pk, count=0, _sum=0):
+        """
+        Adds to the rating count and sum of the object, deriving the
+        average from the new values in the same ``UPDATE``.
+        """
+        name = self.related_field_name
+        new_count = F("%s_count" % name) + count
+        new_sum = F("%s_sum" % name) + _sum
+        average = Coalesce(Cast(new_sum, FloatField()) / NullIf(new_count, 0),
+                           Value(0.0))
+        self.model._base_manager.filter(pk=object_pk).update(**{
+            "%s_count" % name: new_count,
+            "%s_sum" % name: new_sum,
+            "%s_average" % name: average,
+        })
+
     def related_items_changed(self, instance, related_manager):
         """
         Calculates and saves the average rating.
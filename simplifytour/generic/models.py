@@ -65,6 +65,16 @@ class Rating(models.Model):
         verbose_name = _("Rating")
         verbose_name_plural = _("Ratings")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the stored value, so ``RatingField`` can apply the
+        difference when the rating is changed.
+        """
+        instance = super(Rating, cls).from_db(db, field_names, values)
+        instance._loaded_value = instance.__dict__.get("value")
+        return instance
+
     def save(self, *args, **kwargs):
         """
         Validate that the rating falls between the min and max values.
@@ -74,6 +84,7 @@ class Rating(models.Model):
             raise ValueError("Invalid rating. %s is not in %s" % (self.value,
                 ", ".join(valid)))
         super(Rating, self).save(*args, **kwargs)
+        self._loaded_value = self.value
 
 
 class ThreadedComment(Comment):
@@ -0,0 +1,69 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from config import celery_app
+
+from simplifytour.generic.fields import RatingField
+from simplifytour.generic.models import Rating
+
+
+def rating_fields():
+    """
+    Yields each ``RatingField`` along with the concrete model that
+    stores its totals.
+    """
+    for model in apps.get_models():
+        for field in model._meta.private_fields:
+            if (isinstance(field, RatingField) and
+                    not getattr(field, "mti_inherited", False)):
+                yield model, field
+
+
+@celery_app.task()
+def related_items_changed(model_label, field_name, content_type_id,
+                          object_pks):
+    """
+    Calls ``related_items_changed`` for each of the objects whose
+    related items were changed by a committed transaction.
+    """
+    field = apps.get_model(model_label)._meta.get_field(field_name)
+    field.process_related_items_changed(content_type_id, object_pks)
+
+
+@celery_app.task()
+def reconcile_ratings():
+    """
+    Recomputes the rating totals of objects whose stored count or sum
+    has drifted from their ``Rating`` rows, eg after ratings were
+    changed with ``QuerySet.update`` or a delta update was lost.
+    Ratings may be stored against the content type of the model or
+    any of its subclasses. Returns the number of objects fixed.
+    """
+    fixed = 0
+    for model, field in rating_fields():
+        content_types = ContentType.objects.get_for_models(
+            *[m for m in apps.get_models() if issubclass(m, model)],
+            for_concrete_models=False).values()
+        ratings = Rating.objects.filter(content_type__in=content_types,
+                                        object_pk=OuterRef("pk"))
+        ratings = ratings.order_by().values("object_pk")
+        count = ratings.annotate(total=Count("id")).values("total")
+        _sum = ratings.annotate(total=Sum("value")).values("total")
+        name = field.related_field_name
+        drifted = model._base_manager.annotate(
+            actual_count=Coalesce(Subquery(count, IntegerField()), 0),
+            actual_sum=Coalesce(Subquery(_sum, IntegerField()), 0),
+        ).exclude(**{"%s_count" % name: F("actual_count"),
+                     "%s_sum" % name: F("actual_sum")})
+        for pk, actual_count, actual_sum in drifted.values_list(
+                "pk", "actual_count", "actual_sum"):
+            average = actual_sum / actual_count if actual_count else 0
+            model._base_manager.filter(pk=pk).update(**{
+                "%s_count" % name: actual_count,
+                "%s_sum" % name: actual_sum,
+                "%s_average" % name: average,
+            })
+            fixed += 1
+    return fixed
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from simplifytour.generic.models import AssignedKeyword, Keyword, Rating
+from simplifytour.generic.tasks import reconcile_ratings
+from simplifytour.packages.models import Package
+
+
+class RatingTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create(email="guide@example.com")
+        self.package = Package.objects.create(title="Annapurna Circuit",
+                                              content="", provided_by=user,
+                                              site_id=1)
+
+    def assertTotals(self, count, _sum, average):
+        package = Package.objects.get(pk=self.package.pk)
+        self.assertEqual((package.rating_count, package.rating_sum,
+                          package.rating_average), (count, _sum, average))
+
+    def test_delta_updates(self):
+        """
+        Adding, changing and deleting ratings applies the difference
+        to the stored totals.
+        """
+        Rating.objects.create(value=4, content_object=self.package)
+        rating = Rating.objects.create(value=2, content_object=self.package)
+        self.assertTotals(2, 6, 3)
+        rating = Rating.objects.get(pk=rating.pk)
+        rating.value = 5
+        rating.save()
+        self.assertTotals(2, 9, 4.5)
+        rating.delete()
+        self.assertTotals(1, 4, 4)
+        Rating.objects.get().delete()
+        self.assertTotals(0, 0, 0)
+
+    def test_reconcile_ratings(self):
+        Rating.objects.create(value=4, content_object=self.package)
+        Rating.objects.create(value=1, content_object=self.package)
+        Package.objects.filter(pk=self.package.pk).update(
+            rating_count=7, rating_sum=1, rating_average=0)
+        self.assertEqual(reconcile_ratings(), 1)
+        self.assertTotals(2, 5, 2.5)
+        self.assertEqual(reconcile_ratings(), 0)
+
+
+class KeywordsFieldTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create(email="guide@example.com")
+        self.package = Package.objects.create(title="Annapurna Circuit",
+                                              content="", provided_by=user,
+                                              site_id=1)
+        self.field = Package._meta.get_field("keywords")
+        self.keywords = [Keyword.objects.create(title=title, site_id=1)
+                         for title in ("Trek", "Himalaya", "Lakes")]
+
+    def save_keywords(self, *keywords):
+        data = ",".join(str(keyword.id) for keyword in keywords)
+        self.field.save_form_data(self.package, data)
+
+    def assigned(self):
+        return list(self.package.keywords.order_by("_order")
+                    .values_list("keyword__title", "_order"))
+
+    def test_add_and_remove(self):
+        """
+        Only the difference is applied: kept assignments are reordered
+        in place, and keywords no longer assigned to anything are
+        deleted.
+        """
+        trek, himalaya, lakes = self.keywords
+        self.save_keywords(trek, himalaya, trek)
+        self.assertEqual(self.assigned(), [("Trek", 0), ("Himalaya", 1)])
+        kept = self.package.keywords.get(keyword=himalaya).pk
+        self.save_keywords(lakes, himalaya)
+        self.assertEqual(self.assigned(), [("Lakes", 0), ("Himalaya", 1)])
+        self.assertEqual(self.package.keywords.get(keyword=himalaya).pk, kept)
+        self.assertFalse(Keyword.objects.filter(pk=trek.pk).exists())
+        package = Package.objects.get(pk=self.package.pk)
+        self.assertEqual(package.keywords_string, "Lakes Himalaya")
+        self.save_keywords()
+        self.assertFalse(AssignedKeyword.objects.exists())
+        self.assertEqual(Package.objects.get(pk=self.package.pk)
+                         .keywords_string, "")
@@ -1,9 +1,10 @@
 import graphene
 
+from simplifytour.graphapi.packages.schema import PackageQueries
 from simplifytour.graphapi.users.schema import UserMutations, UserQueries
 
 
-class Query(UserQueries):
+class Query(UserQueries, PackageQueries):
     node = graphene.Node.Field()
 
 
@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from promise import Promise
+from promise.dataloader import DataLoader as BaseLoader
+
+
+class DataLoader(BaseLoader):
+    """
+    Per-request ``DataLoader``. Instances are stored on the request
+    (``info.context``) under ``context_key`` so that every resolver
+    taking part in the same GraphQL request shares one loader, and
+    therefore one batch, per relation.
+    """
+
+    context_key = None
+    context = None
+
+    def __new__(cls, context):
+        key = cls.context_key
+        if key is None:
+            raise TypeError("Data loader %r does not define a context key" % (cls,))
+        if not hasattr(context, "dataloaders"):
+            context.dataloaders = {}
+        if key not in context.dataloaders:
+            context.dataloaders[key] = super(DataLoader, cls).__new__(cls)
+        loader = context.dataloaders[key]
+        assert isinstance(loader, cls), "Context key %r is already used by %r" % (key, loader)
+        return loader
+
+    def __init__(self, context):
+        if getattr(self, "context", None) != context:
+            self.context = context
+            super(DataLoader, self).__init__()
+
+    def batch_load_fn(self, keys):
+        results = self.batch_load(keys)
+        if not isinstance(results, Promise):
+            return Promise.resolve(results)
+        return results
+
+    def batch_load(self, keys):
+        raise NotImplementedError()
+
+
+class ObjectByIdLoader(DataLoader):
+    """
+    Loads single model instances by primary key with one
+    ``pk__in`` query per batch.
+    """
+
+    model = None
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+    def batch_load(self, keys):
+        objects = self.get_queryset().in_bulk(keys)
+        return [objects.get(key) for key in keys]
+
+
+class ObjectsByThroughLoader(DataLoader):
+    """
+    Loads lists of related objects for many-to-many relations keyed by
+    the owner's primary key. The ``through`` model is queried once per
+    batch with ``select_related`` on the target, so a batch of N
+    owners costs a single query regardless of N.
+    """
+
+    through = None
+    owner_field = None
+    target_field = None
+    ordering = None
+
+    def get_queryset(self):
+        queryset = self.through._default_manager.select_related(self.target_field)
+        if self.ordering:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset
+
+    def batch_load(self, keys):
+        lookup = {"%s_id__in" % self.owner_field: keys}
+        related = defaultdict(list)
+        for row in self.get_queryset().filter(**lookup):
+            owner_id = getattr(row, "%s_id" % self.owner_field)
+            related[owner_id].append(getattr(row, self.target_field))
+        return [related[key] for key in keys]
@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+
+from simplifytour.graphapi.core.dataloaders import (
+    DataLoader, ObjectByIdLoader, ObjectsByThroughLoader
+)
+from simplifytour.packages.models import (
+    Guide, Package, PackageAddons, PackageItinerary, Porter, Price
+)
+from simplifytour.packages.quotes import QuoteEngine
+
+
+class UserByIdLoader(ObjectByIdLoader):
+    context_key = "user_by_id"
+    model = get_user_model()
+
+
+class PorterByIdLoader(ObjectByIdLoader):
+    context_key = "porter_by_id"
+    model = Porter
+
+
+class GuideByIdLoader(ObjectByIdLoader):
+    context_key = "guide_by_id"
+    model = Guide
+
+
+class PricesByPackageIdLoader(DataLoader):
+    context_key = "prices_by_package_id"
+
+    def batch_load(self, keys):
+        prices = defaultdict(list)
+        queryset = Price.objects.filter(package_id__in=keys, is_archived=False)
+        for price in queryset.order_by("package_id", "-discounted_price"):
+            prices[price.package_id].append(price)
+        return [prices[key] for key in keys]
+
+
+class FromPriceByPackageIdLoader(DataLoader):
+    context_key = "from_price_by_package_id"
+
+    def batch_load(self, keys):
+        from_prices = QuoteEngine(keys).from_prices()
+        return [from_prices.get(key) for key in keys]
+
+
+class ItineraryByPackageIdLoader(ObjectsByThroughLoader):
+    context_key = "itinerary_by_package_id"
+    through = PackageItinerary
+    owner_field = "package"
+    target_field = "item"
+    ordering = ("package_id", "_order")
+
+
+class AddonsByPackageIdLoader(ObjectsByThroughLoader):
+    context_key = "addons_by_package_id"
+    through = PackageAddons
+    owner_field = "package"
+    target_field = "item"
+    ordering = ("package_id", "id")
+
+
+class PortersByPackageIdLoader(ObjectsByThroughLoader):
+    context_key = "porters_by_package_id"
+    through = Package.porters.through
+    owner_field = "package"
+    target_field = "porter"
+    ordering = ("package_id", "porter_id")
+
+
+class GuidesByPackageIdLoader(ObjectsByThroughLoader):
+    context_key = "guides_by_package_id"
+    through = Package.guides.through
+    owner_field = "package"
+    target_field = "guide"
+    ordering = ("package_id", "guide_id")
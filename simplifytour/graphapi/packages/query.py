@@ -0,0 +1,196 @@
+import graphene
+
+from graphene_django.filter.fields import DjangoFilterConnectionField
+from graphene_django.types import DjangoObjectType
+
+from simplifytour.graphapi.users.query import UserQuery
+from simplifytour.packages.models import (
+    Departure, Package, Price, ItineraryItem, Porter, Guide
+)
+from .dataloaders import (
+    AddonsByPackageIdLoader, FromPriceByPackageIdLoader, GuideByIdLoader,
+    GuidesByPackageIdLoader, ItineraryByPackageIdLoader, PorterByIdLoader,
+    PortersByPackageIdLoader, PricesByPackageIdLoader, UserByIdLoader
+)
+
+
+def listed_packages(info):
+    """
+    Packages the current user can see in the catalog: published and
+    not archived.
+    """
+    published = Package.objects.published(for_user=info.context.user)
+    return published.filter(is_archived=False)
+
+
+class PriceQuery(DjangoObjectType):
+    standard_text = graphene.String()
+    starting_date = graphene.List(graphene.String)
+
+    class Meta: # pylint: disable=too-few-public-methods
+        model = Price
+        only_fields = (
+            'id', 'standard', 'marked_price', 'discounted_price', 'price_notes',
+            'min_group_size', 'max_group_size', 'reduced_by', 'booking_amount',
+            'extra_content',
+        )
+        interfaces = (graphene.relay.Node, )
+
+    @staticmethod
+    def resolve_starting_date(root, info):
+        return root.starting_date or []
+
+
+class ItineraryItemQuery(DjangoObjectType):
+    class Meta: # pylint: disable=too-few-public-methods
+        model = ItineraryItem
+        only_fields = (
+            'id', 'title', 'description', 'price', 'days', 'duration',
+            'starting_time', 'end_time',
+        )
+        interfaces = (graphene.relay.Node, )
+
+
+class PorterQuery(DjangoObjectType):
+    class Meta: # pylint: disable=too-few-public-methods
+        model = Porter
+        only_fields = ('id', 'ratio', 'count', 'rate', 'remarks')
+        interfaces = (graphene.relay.Node, )
+
+
+class GuideQuery(DjangoObjectType):
+    class Meta: # pylint: disable=too-few-public-methods
+        model = Guide
+        only_fields = ('id', 'language', 'rate', 'remarks')
+        interfaces = (graphene.relay.Node, )
+
+
+class PackageQuery(DjangoObjectType):
+    """
+    Relations are resolved through per-request ``DataLoader`` instances,
+    so a page of packages costs one query per relation rather than one
+    query per relation per package. ``days`` and the default porter and
+    guide come from the ``with_summary()`` annotations, and
+    ``from_price`` from a ``QuoteEngine`` batch.
+    """
+    days = graphene.Decimal()
+    from_price = graphene.Decimal()
+    default_porter = graphene.Field(PorterQuery)
+    default_guide = graphene.Field(GuideQuery)
+    prices = graphene.List(PriceQuery)
+    itinerary = graphene.List(ItineraryItemQuery)
+    addons = graphene.List(ItineraryItemQuery)
+    porters = graphene.List(PorterQuery)
+    guides = graphene.List(GuideQuery)
+    provided_by = graphene.Field(UserQuery)
+
+    class Meta: # pylint: disable=too-few-public-methods
+        model = Package
+        filter_fields = {
+            'slug': ['exact', ],
+            'title': ['icontains', ],
+            'is_featured': ['exact', ],
+            'min_price': ['lte', 'gte', ],
+            'total_days': ['lte', 'gte', ],
+            'max_group_size': ['gte', ],
+        }
+        only_fields = (
+            'id', 'title', 'slug', 'description', 'content', 'include', 'exclude',
+            'featured_image', 'publish_date', 'is_featured', 'login_required',
+            'porter_required', 'porter_days', 'guide_required', 'guide_days',
+            'rating_count', 'rating_average', 'min_price', 'max_group_size',
+            'total_days', 'departure_count',
+        )
+        interfaces = (graphene.relay.Node, )
+
+    @classmethod
+    def get_node(cls, info, id):
+        return listed_packages(info).filter(pk=id).with_summary().first()
+
+    @staticmethod
+    def resolve_prices(root, info):
+        return PricesByPackageIdLoader(info.context).load(root.id)
+
+    @staticmethod
+    def resolve_from_price(root, info):
+        return FromPriceByPackageIdLoader(info.context).load(root.id)
+
+    @staticmethod
+    def resolve_itinerary(root, info):
+        return ItineraryByPackageIdLoader(info.context).load(root.id)
+
+    @staticmethod
+    def resolve_addons(root, info):
+        return AddonsByPackageIdLoader(info.context).load(root.id)
+
+    @staticmethod
+    def resolve_porters(root, info):
+        return PortersByPackageIdLoader(info.context).load(root.id)
+
+    @staticmethod
+    def resolve_guides(root, info):
+        return GuidesByPackageIdLoader(info.context).load(root.id)
+
+    @staticmethod
+    def resolve_days(root, info):
+        return root.days
+
+    @staticmethod
+    def resolve_default_porter(root, info):
+        if not hasattr(root, "summary_porter_id"):
+            return root.default_porter
+        if root.summary_porter_id is None:
+            return None
+        return PorterByIdLoader(info.context).load(root.summary_porter_id)
+
+    @staticmethod
+    def resolve_default_guide(root, info):
+        if not hasattr(root, "summary_guide_id"):
+            return root.default_guide
+        if root.summary_guide_id is None:
+            return None
+        return GuideByIdLoader(info.context).load(root.summary_guide_id)
+
+    @staticmethod
+    def resolve_provided_by(root, info):
+        return UserByIdLoader(info.context).load(root.provided_by_id)
+
+
+class DepartureQuery(DjangoObjectType):
+    class Meta: # pylint: disable=too-few-public-methods
+        model = Departure
+        only_fields = (
+            'id', 'date', 'min_group_size', 'max_group_size', 'price', 'package',
+        )
+        interfaces = (graphene.relay.Node, )
+
+
+class Queries(graphene.ObjectType):
+    packages = DjangoFilterConnectionField(
+        PackageQuery, departs_from=graphene.Date(), departs_until=graphene.Date(),
+        group_size=graphene.Int())
+    package = graphene.Field(PackageQuery, slug=graphene.String(required=True))
+    departures = graphene.List(
+        DepartureQuery, departs_from=graphene.Date(required=True),
+        departs_until=graphene.Date(required=True), group_size=graphene.Int())
+
+    @staticmethod
+    def resolve_packages(root, info, departs_from=None, departs_until=None,
+                         group_size=None, **kwargs):
+        published = listed_packages(info)
+        if departs_from or departs_until or group_size:
+            published = published.departing(departs_from, departs_until,
+                                             group_size)
+        return published.with_summary()
+
+    @staticmethod
+    def resolve_departures(root, info, departs_from, departs_until,
+                           group_size=None):
+        departures = Departure.objects.available(departs_from, departs_until,
+                                                 group_size)
+        departures = departures.filter(package__in=listed_packages(info))
+        return departures.select_related("price", "package")
+
+    @staticmethod
+    def resolve_package(root, info, slug):
+        return listed_packages(info).filter(slug=slug).with_summary().first()
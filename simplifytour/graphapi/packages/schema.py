@@ -0,0 +1,5 @@
+from .query import Queries
+
+
+class PackageQueries(Queries):
+    pass
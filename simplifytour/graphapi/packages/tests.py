@@ -0,0 +1,107 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from graphql_relay import to_global_id
+
+from simplifytour.graphapi.api import schema
+from simplifytour.packages.models import (
+    Guide, ItineraryItem, Package, PackageAddons, PackageItinerary, Porter,
+    Price
+)
+
+PACKAGES_QUERY = """
+{
+  packages {
+    edges {
+      node {
+        id title days fromPrice
+        defaultPorter { id rate }
+        defaultGuide { id language }
+        prices { id discountedPrice startingDate }
+        itinerary { id title days }
+        addons { id title price }
+        porters { id count }
+        guides { id language }
+        providedBy { id email }
+      }
+    }
+  }
+}
+"""
+
+
+class PackagesQueryTests(TestCase):
+
+    def setUp(self):
+        self.porter = Porter.objects.create(ratio=2, count=3, rate=15,
+                                            remarks="Porters")
+        self.guide = Guide.objects.create(language="English", rate=30,
+                                          remarks="Guide")
+
+    def create_packages(self, count):
+        start = Package.objects.count()
+        for i in range(start, start + count):
+            user = get_user_model().objects.create(
+                email="guide%s@example.com" % i)
+            package = Package.objects.create(title="Trek %s" % i, content="",
+                                             provided_by=user, site_id=1)
+            Price.objects.create(package=package, discounted_price=100 + i,
+                                 min_group_size=1, max_group_size=8,
+                                 price_notes="Autumn",
+                                 starting_date=[date(2026, 10, 1)])
+            day, addon = [ItineraryItem.objects.create(
+                title="%s %s" % (title, i), description="", provided_by=user)
+                for title in ("Day", "Rafting")]
+            PackageItinerary.objects.create(package=package, item=day)
+            PackageAddons.objects.create(package=package, item=addon)
+            package.porters.add(self.porter)
+            package.guides.add(self.guide)
+
+    def execute(self, query=PACKAGES_QUERY):
+        request = RequestFactory().post("/graphql/")
+        request.user = AnonymousUser()
+        result = schema.execute(query, context_value=request)
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_query_count_is_constant(self):
+        """
+        Relations are loaded in one batch per request, so the number
+        of queries stays the same as the number of packages grows.
+        """
+        query_counts = []
+        for count in (5, 25):
+            self.create_packages(count - Package.objects.count())
+            with CaptureQueriesContext(connection) as queries:
+                edges = self.execute()["packages"]["edges"]
+            query_counts.append(len(queries))
+            self.assertEqual(len(edges), count)
+            for edge in edges:
+                node = edge["node"]
+                self.assertEqual(len(node["prices"]), 1)
+                self.assertEqual(len(node["itinerary"]), 1)
+                self.assertEqual(len(node["addons"]), 1)
+                self.assertEqual(node["defaultPorter"]["rate"], 15)
+                self.assertTrue(node["providedBy"]["email"])
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_archived_packages_hidden(self):
+        self.create_packages(2)
+        archived, listed = Package.objects.order_by("pk")
+        Package.objects.filter(pk=archived.pk).update(is_archived=True)
+        edges = self.execute()["packages"]["edges"]
+        self.assertEqual([edge["node"]["title"] for edge in edges],
+                         [listed.title])
+        for package, expected in ((archived, None), (listed, listed.title)):
+            node_id = to_global_id("PackageQuery", package.pk)
+            data = self.execute("""{
+              package(slug: "%s") { title }
+              node(id: "%s") { ... on PackageQuery { title } }
+            }""" % (package.slug, node_id))
+            for field in ("package", "node"):
+                title = data[field] and data[field]["title"]
+                self.assertEqual(title, expected)
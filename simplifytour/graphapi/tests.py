@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from django.test import TestCase
+from graphql.error import GraphQLError
+from graphql_relay import to_global_id
+
+from simplifytour.graphapi.packages.query import GuideQuery, PorterQuery
+from simplifytour.graphapi.utils import get_nodes
+from simplifytour.packages.models import Guide, Porter
+
+
+class GetNodesTests(TestCase):
+
+    def setUp(self):
+        self.porters = [Porter.objects.create(ratio=2, count=1, rate=rate,
+                                              remarks="Porter")
+                        for rate in (10, 15, 20)]
+
+    def node_id(self, instance, type_name="PorterQuery"):
+        return to_global_id(type_name, instance.pk)
+
+    def test_order_and_duplicates(self):
+        """
+        Nodes are returned in the order of their first ID, once each.
+        """
+        first, second, third = self.porters
+        ids = [self.node_id(p) for p in (third, first, third, second, first)]
+        for graphene_type in (PorterQuery, None):
+            with self.assertNumQueries(1):
+                nodes = get_nodes(ids, graphene_type)
+            self.assertEqual(nodes, [third, first, second])
+
+    def test_memoized_on_context(self):
+        first, second, third = self.porters
+        context = SimpleNamespace()
+        get_nodes([self.node_id(first)], PorterQuery, context=context)
+        with self.assertNumQueries(1):
+            nodes = get_nodes([self.node_id(second), self.node_id(first)],
+                              PorterQuery, context=context)
+        self.assertEqual(nodes, [second, first])
+        with self.assertNumQueries(0):
+            get_nodes([self.node_id(first)], PorterQuery, context=context)
+
+    def test_invalid_ids(self):
+        guide = Guide.objects.create(language="English", rate=30,
+                                     remarks="Guide")
+        porter = self.porters[0]
+        with self.assertRaises(AssertionError):
+            get_nodes([self.node_id(porter), self.node_id(guide, "GuideQuery")])
+        with self.assertRaises(AssertionError):
+            get_nodes([self.node_id(porter)], GuideQuery)
+        with self.assertRaises(AssertionError):
+            get_nodes([self.node_id(porter), to_global_id("PorterQuery", 0)])
+        with self.assertRaises(GraphQLError):
+            get_nodes([to_global_id("PorterQuery", 0)])
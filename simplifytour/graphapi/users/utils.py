@@ -49,17 +49,14 @@ from django.core.mail import EmailMessage
 #     )
 #     email.send()
 
-from djoser.compat import get_user_email
 from djoser.email import ActivationEmail, PasswordResetEmail
 
+from simplifytour.users.emails import queue_email
+
 
 def send_activation_email(context):
-    print("######## send_activation_email user ##############", context.user)
-    to = [get_user_email(context.user)]
-    ActivationEmail(context.request, {'user': context.user}).send(to)
+    queue_email(ActivationEmail, context['request'], context['user'])
 
 
 def send_reset_password_email(context):
-    user = context['user']
-    to = [get_user_email(user)]
-    PasswordResetEmail(context['request'], {'user': user}).send(to)
+    queue_email(PasswordResetEmail, context['request'], context['user'])
@@ -25,8 +25,8 @@ def get_database_id(info, node_id, only_type):
 # private method
 def _check_graphene_type(requested_graphene_type, received_type):
     if requested_graphene_type:
-        assert str(requested_graphene_type) == received_type,
-        (f"must receive an {str(requested_graphene_type)} id")
+        assert str(requested_graphene_type) == received_type, (
+            f"must receive an {str(requested_graphene_type)} id")
 
 # private method
 def _resolve_nodes(ids, graphene_type=None):
@@ -51,21 +51,34 @@ def _resolve_nodes(ids, graphene_type=None):
 
     return used_type, pks
 
+# Graphene types by name, filled from the registry on first use and
+# whenever a name is missing, eg for types registered later on.
+_graphene_types = {}
+
+
 def _resolve_graphene_type(type_name):
-    for _, _type in registry._registry.items():
-        if _type._meta.name == type_name:
-            return _type
-    raise AssertionError("Could not resolve the type {}".format(type_name))
+    if type_name not in _graphene_types:
+        for _type in registry._registry.values():
+            _graphene_types[_type._meta.name] = _type
+    try:
+        return _graphene_types[type_name]
+    except KeyError:
+        raise AssertionError("Could not resolve the type {}".format(type_name))
 
 
-def get_nodes(ids, graphene_type=None, qs=None):
+def get_nodes(ids, graphene_type=None, qs=None, context=None):
     """Return a list of nodes.
     If the `graphene_type` argument is provided, the IDs will be validated
     against this type. If the type was not provided, it will be looked up in
     the Graphene's registry. Raises an error if not all IDs are of the same
     type.
+    If `context` (the request, `info.context`) is provided, fetched nodes are
+    memoized on it, so later calls in the same request only query the IDs
+    that haven't been fetched yet. Nodes fetched with a custom `qs` are not
+    memoized, since it may filter or annotate them differently.
     """
     nodes_type, pks = _resolve_nodes(ids, graphene_type)
+    pks = list(dict.fromkeys(pks))  # drop duplicates, keep the order
 
     # If `graphene_type` was not provided, check if all resolved types are
     # the same. This prevents from accidentally mismatching IDs of different
@@ -73,18 +86,27 @@ def get_nodes(ids, graphene_type=None, qs=None):
     if nodes_type and not graphene_type:
         graphene_type = _resolve_graphene_type(nodes_type)
 
+    found = {}
+    if context is not None and qs is None:
+        if not hasattr(context, "nodes"):
+            context.nodes = {}
+        found = context.nodes.setdefault(graphene_type._meta.model, {})
+
     if qs is None:
         qs = graphene_type._meta.model.objects
 
-    nodes = list(qs.filter(pk__in=pks))
-    nodes.sort(key=lambda e: pks.index(str(e.pk)))  # preserve order in pks
+    missing = [pk for pk in pks if pk not in found]
+    if missing:
+        for node in qs.filter(pk__in=missing):
+            found[str(node.pk)] = node
+    # preserve order in pks
+    nodes = [found[pk] for pk in pks if pk in found]
 
     if not nodes:
         raise GraphQLError(ERROR_COULD_NO_RESOLVE_GLOBAL_ID % ids)
 
-    nodes_pk_list = [str(node.pk) for node in nodes]
     for pk in pks:
-        assert pk in nodes_pk_list, "There is no node of type {} with pk {}".format(
+        assert pk in found, "There is no node of type {} with pk {}".format(
             graphene_type, pk
         )
     return nodes
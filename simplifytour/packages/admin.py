@@ -301,9 +301,10 @@ class PriceAdmin(admin.ModelAdmin):
         if not remove_date is None:
             try:
                 obj.starting_date.remove(remove_date)
-                obj.save()
-            except:
+            except ValueError:
                 pass
+            else:
+                obj.save()
         return super(PriceAdmin, self).render_change_form(request, *args, obj=obj, **kwargs)
 
 
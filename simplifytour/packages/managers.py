@@ -1,10 +1,107 @@
+from datetime import date
+
 from django.conf import settings
+from django.db.models import ProtectedError
+from django.db.models import (Count, DecimalField, Manager, Max, Min,
+                              OuterRef, PositiveSmallIntegerField, QuerySet,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date
 
-from simplifytour.core.managers import DisplayableManager
+from simplifytour.core.managers import (DisplayableManager, SearchableQuerySet,
+                                        TreeManager)
+from simplifytour.packages.signals import departures_synced
+from simplifytour.utils.deprecation import is_authenticated
 from simplifytour.utils.urls import home_slug
 
 
-class PackageManager(DisplayableManager):
+def summary_columns(prices, itinerary, departures):
+    """
+    Expressions for the denormalized summary columns on ``Package``,
+    for use in ``update()``, given querysets of the unarchived prices,
+    itinerary entries and active departures to summarize.
+    """
+    def aggregate(queryset, function, field, output_field):
+        values = queryset.filter(package=OuterRef("pk")).order_by()
+        values = values.values("package").annotate(value=function(field))
+        return Subquery(values.values("value"), output_field=output_field)
+
+    money = DecimalField(max_digits=10, decimal_places=2)
+    days = DecimalField(max_digits=7, decimal_places=2)
+    count = PositiveSmallIntegerField()
+    return {
+        "min_price": aggregate(prices, Min, "discounted_price", money),
+        "max_group_size": aggregate(prices, Max, "max_group_size", count),
+        "total_days": Coalesce(aggregate(itinerary, Sum, "item__days", days),
+                               Value(0)),
+        "departure_count": Coalesce(aggregate(departures, Count, "pk", count),
+                                    Value(0)),
+    }
+
+
+class PackageQuerySet(SearchableQuerySet):
+
+    def with_summary(self):
+        """
+        Annotate each package with the values behind ``Package.days``,
+        ``Package.default_porter`` and ``Package.default_guide`` using
+        correlated subqueries, so a listing computes them in the same
+        query that loads the packages rather than issuing several
+        queries per package.
+        """
+        from simplifytour.packages.models import PackageItinerary
+        days = PackageItinerary.objects.filter(package=OuterRef("pk"))
+        days = days.order_by().values("package").annotate(
+            total=Sum("item__days")).values("total")
+        porters = self.model.porters.through.objects.filter(
+            package=OuterRef("pk")).order_by("porter_id")
+        guides = self.model.guides.through.objects.filter(
+            package=OuterRef("pk")).order_by("guide_id")
+        output_field = DecimalField(max_digits=10, decimal_places=2)
+        return self.annotate(
+            summary_days=Coalesce(Subquery(days, output_field=output_field),
+                                  Value(0), output_field=output_field),
+            summary_porter_id=Subquery(porters.values("porter_id")[:1]),
+            summary_guide_id=Subquery(guides.values("guide_id")[:1]),
+        )
+
+    def departing(self, start=None, end=None, group_size=None):
+        """
+        Packages with a departure between ``start`` and ``end``
+        (inclusive) whose price accepts a group of ``group_size``,
+        filtered with a subquery on the departure table.
+        """
+        from simplifytour.packages.models import Departure
+        departures = Departure.objects.available(start, end, group_size)
+        return self.filter(pk__in=departures.values("package_id"))
+
+
+class PackageManager(DisplayableManager, TreeManager):
+
+    queryset_class = PackageQuerySet
+
+    def with_summary(self):
+        return self.get_queryset().with_summary()
+
+    def departing(self, start=None, end=None, group_size=None):
+        return self.get_queryset().departing(start, end, group_size)
+
+    def refresh_summary(self, package_ids):
+        """
+        Recalculates the ``min_price``, ``max_group_size``,
+        ``total_days`` and ``departure_count`` columns of the given
+        packages in a single ``UPDATE``. Called when their prices or
+        itineraries change.
+        """
+        from simplifytour.packages.models import (Departure,
+                                                  PackageItinerary, Price)
+        package_ids = [package_id for package_id in package_ids if package_id]
+        if package_ids:
+            packages = self.model._base_manager.filter(pk__in=package_ids)
+            packages.update(**summary_columns(
+                Price.objects.filter(is_archived=False),
+                PackageItinerary.objects.all(),
+                Departure.objects.filter(is_active=True)))
 
     def published(self, for_user=None, include_login_required=False):
         """
@@ -20,7 +117,7 @@ class PackageManager(DisplayableManager):
         ``PageMiddleware``.
         """
         published = super(PackageManager, self).published(for_user=for_user)
-        unauthenticated = for_user and not for_user.is_authenticated()
+        unauthenticated = for_user and not is_authenticated(for_user)
         if (unauthenticated and not include_login_required and not
         settings.PACKAGES_PUBLISHED_INCLUDE_LOGIN_REQUIRED):
             published = published.exclude(login_required=True)
@@ -81,3 +178,84 @@ class PackageManager(DisplayableManager):
 
     def with_ascendants_for_keyword(self, slug, **kwargs):
         return self.published(**kwargs)
+
+
+def departure_dates(starting_date):
+    """
+    The set of dates in a ``Price.starting_date`` list, which holds
+    ``date`` objects when set from ``PriceDateForm`` and ISO strings
+    once loaded from the database. Unparseable entries are skipped.
+    """
+    dates = set()
+    for value in starting_date or []:
+        if not isinstance(value, date):
+            try:
+                value = parse_date(str(value)[:10])
+            except ValueError:
+                value = None
+        if value is not None:
+            dates.add(value)
+    return dates
+
+
+class DepartureQuerySet(QuerySet):
+
+    def available(self, start=None, end=None, group_size=None):
+        """
+        Active departures between ``start`` and ``end`` (inclusive)
+        for a group of ``group_size``, answered from the departure
+        date index rather than by parsing ``Price.starting_date``.
+        """
+        departures = self.filter(is_active=True)
+        if start is not None:
+            departures = departures.filter(date__gte=start)
+        if end is not None:
+            departures = departures.filter(date__lte=end)
+        if group_size is not None:
+            departures = departures.filter(min_group_size__lte=group_size,
+                                           max_group_size__gte=group_size)
+        return departures
+
+
+class DepartureManager(Manager):
+
+    def get_queryset(self):
+        return DepartureQuerySet(self.model, using=self._db)
+
+    def available(self, start=None, end=None, group_size=None):
+        return self.get_queryset().available(start, end, group_size)
+
+    def sync(self, price):
+        """
+        Brings the departures for ``price`` in line with its
+        ``starting_date`` list and group size bounds. Archived prices
+        have no active departures. Departures for dates that have been
+        removed are deleted, unless something such as a booking
+        protects them, in which case they're kept but made inactive.
+        """
+        departures = self.filter(price=price)
+        dates = set() if price.is_archived else departure_dates(
+            price.starting_date)
+        existing = dict(departures.values_list("date", "is_active"))
+        removed = set(existing) - dates
+        kept = []
+        for departure in departures.filter(date__in=removed):
+            try:
+                departure.delete()
+            except ProtectedError:
+                kept.append(departure.pk)
+        if kept:
+            departures.filter(pk__in=kept).update(is_active=False)
+        restored = [d for d in dates if existing.get(d) is False]
+        if restored:
+            departures.filter(date__in=restored).update(is_active=True)
+        fields = {
+            "package_id": price.package_id,
+            "min_group_size": price.min_group_size,
+            "max_group_size": price.max_group_size,
+        }
+        if set(existing) - removed or kept:
+            departures.exclude(**fields).update(**fields)
+        self.bulk_create([self.model(price=price, date=d, **fields)
+                          for d in sorted(dates - set(existing))])
+        departures_synced.send(sender=self.model, price=price)
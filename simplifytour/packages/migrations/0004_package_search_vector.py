@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:29
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Index and populate ``search_vector`` on PostgreSQL, from the same
+    fields, weights and configuration used when packages are saved.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.apps import apps as global_apps
+    from simplifytour.core.search import search_vector, vector_fields
+    schema_editor.execute(
+        "CREATE INDEX packages_package_search_vector_gin "
+        "ON packages_package USING gin (search_vector)")
+    Package = apps.get_model("packages", "Package")
+    indexed = vector_fields(global_apps.get_model("packages", "Package"))
+    Package._base_manager.using(schema_editor.connection.alias).update(
+        search_vector=search_vector(indexed))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "DROP INDEX IF EXISTS packages_package_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0003_auto_20190804_1201'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
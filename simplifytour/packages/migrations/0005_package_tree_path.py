@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+def populate_tree_paths(apps, schema_editor):
+    """
+    Build ``tree_path`` for existing packages, parents before their
+    children.
+    """
+    Package = apps.get_model("packages", "Package")
+    packages = Package._base_manager.using(schema_editor.connection.alias)
+    parents = dict(packages.values_list("id", "parent_id"))
+    paths = {}
+
+    def path_for(package_id):
+        if package_id not in paths:
+            parent_id = parents[package_id]
+            prefix = path_for(parent_id) if parent_id else ""
+            paths[package_id] = "%s%s/" % (prefix, package_id)
+        return paths[package_id]
+
+    updated = []
+    for package in packages.only("id"):
+        package.tree_path = path_for(package.id)
+        updated.append(package)
+    packages.bulk_update(updated, ["tree_path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0004_package_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=1000),
+        ),
+        migrations.RunPython(populate_tree_paths, migrations.RunPython.noop),
+    ]
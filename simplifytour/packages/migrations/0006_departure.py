@@ -0,0 +1,77 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:49
+
+from datetime import date
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.dateparse import parse_date
+
+
+def departure_dates(starting_date):
+    """
+    The set of dates in a ``Price.starting_date`` list, which holds
+    ISO strings once loaded from the database. Unparseable entries
+    are skipped.
+    """
+    dates = set()
+    for value in starting_date or []:
+        if not isinstance(value, date):
+            try:
+                value = parse_date(str(value)[:10])
+            except ValueError:
+                value = None
+        if value is not None:
+            dates.add(value)
+    return dates
+
+
+def populate_departures(apps, schema_editor):
+    """
+    Create departures for the ``starting_date`` of existing prices.
+    """
+    db = schema_editor.connection.alias
+    Price = apps.get_model("packages", "Price")
+    Departure = apps.get_model("packages", "Departure")
+    departures = []
+    for price in Price.objects.using(db).filter(is_archived=False):
+        for day in sorted(departure_dates(price.starting_date)):
+            departures.append(Departure(
+                price_id=price.id, package_id=price.package_id, date=day,
+                min_group_size=price.min_group_size,
+                max_group_size=price.max_group_size))
+    Departure.objects.using(db).bulk_create(departures, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0005_package_tree_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Departure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('min_group_size', models.PositiveSmallIntegerField(default=1)),
+                ('max_group_size', models.PositiveSmallIntegerField()),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='packages.Package')),
+                ('price', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='packages.Price')),
+            ],
+            options={
+                'verbose_name': 'Departure',
+                'verbose_name_plural': 'Departures',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='departure',
+            index=models.Index(fields=['date', 'max_group_size', 'min_group_size'], name='packages_de_date_1cf309_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='departure',
+            unique_together={('price', 'date')},
+        ),
+        migrations.RunPython(populate_departures, migrations.RunPython.noop),
+    ]
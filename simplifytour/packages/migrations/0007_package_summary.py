@@ -0,0 +1,64 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:55
+
+from django.db import migrations, models
+from django.db.models import (Count, DecimalField, Max, Min, OuterRef,
+                              PositiveSmallIntegerField, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+
+
+def populate_summary(apps, schema_editor):
+    """
+    Calculate the summary columns for existing packages.
+    """
+    def aggregate(queryset, function, field, output_field):
+        values = queryset.filter(package=OuterRef("pk")).order_by()
+        values = values.values("package").annotate(value=function(field))
+        return Subquery(values.values("value"), output_field=output_field)
+
+    Package = apps.get_model("packages", "Package")
+    Price = apps.get_model("packages", "Price")
+    PackageItinerary = apps.get_model("packages", "PackageItinerary")
+    Departure = apps.get_model("packages", "Departure")
+    prices = Price.objects.filter(is_archived=False)
+    money = DecimalField(max_digits=10, decimal_places=2)
+    days = DecimalField(max_digits=7, decimal_places=2)
+    count = PositiveSmallIntegerField()
+    Package._base_manager.using(schema_editor.connection.alias).update(
+        min_price=aggregate(prices, Min, "discounted_price", money),
+        max_group_size=aggregate(prices, Max, "max_group_size", count),
+        total_days=Coalesce(aggregate(PackageItinerary.objects, Sum,
+                                      "item__days", days), Value(0)),
+        departure_count=Coalesce(aggregate(Departure.objects, Count, "pk",
+                                           count), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0006_departure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='departure_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Departures'),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='max_group_size',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Maximum group size'),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='min_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='From price'),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='total_days',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=7, verbose_name='Total days'),
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
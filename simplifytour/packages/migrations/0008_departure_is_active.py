@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0007_package_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departure',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
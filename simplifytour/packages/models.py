@@ -1,30 +1,34 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tempfile import NamedTemporaryFile
 from urllib.parse import urljoin
-from future.utils import native
 from jsonfield import JSONField
 from string import punctuation
 from zipfile import ZipFile
-from io import BytesIO
 
 from django.utils.translation import ugettext, ugettext_lazy as _
 # from django.contrib.postgres.fields import ArrayField
 from django.contrib.auth import get_user_model
 from django.utils.encoding import force_text
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.core.cache import cache
 from django.conf import settings
 from django.urls import reverse
 from django.apps import apps
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
-from simplifytour.core.models import Displayable, Orderable, RichText
+from simplifytour.core.models import (Displayable, Hierarchical, Orderable,
+                                      RichText)
 from simplifytour.core.fields import FileField, RichTextField
 from simplifytour.utils.importing import import_dotted_path
 from simplifytour.generic.fields import RatingField
 from simplifytour.utils.urls import path_to_slug
 from simplifytour.utils.models import upload_to
 # from simplifytour.pages.models import Page
-from .managers import PackageManager
+from .managers import DepartureManager, PackageManager
 # from .fields import MenusField
 
 '''
@@ -46,7 +50,7 @@ class BasePackage(Orderable, Displayable):
         abstract = True
 
 
-class Package(BasePackage):
+class Package(BasePackage, Hierarchical):
     """
     A package in the package tree. This is the base class that custom content types
     need to subclass.
@@ -98,14 +102,30 @@ class Package(BasePackage):
     other_info = JSONField(default=[], blank=False, null=False, editable=False,
                            help_text=_("Other information of package"))
 
+    # Summaries of the prices, itinerary and departures, kept up to date
+    # by ``PackageManager.refresh_summary`` for sorting and filtering.
+    min_price = models.DecimalField(_("From price"), decimal_places=2, max_digits=10, null=True,
+                                    editable=False, db_index=True)
+    max_group_size = models.PositiveSmallIntegerField(_("Maximum group size"), null=True,
+                                                      editable=False)
+    total_days = models.DecimalField(_("Total days"), decimal_places=2, max_digits=7, default=0,
+                                     editable=False, db_index=True)
+    departure_count = models.PositiveIntegerField(_("Departures"), default=0, editable=False)
+
+    summary_fields = ("min_price", "max_group_size", "total_days", "departure_count")
+
     rating = RatingField(verbose_name=_("Rating"))
 
     @property
     def days(self):
-        total_days = 0
-        for iti_day in self.itinerary.all():
-            total_days += iti_day.days
-        return total_days
+        """
+        Total days of the itinerary. Uses the ``summary_days``
+        annotation added by ``Package.objects.with_summary()`` when
+        present, otherwise sums the itinerary in the database.
+        """
+        if hasattr(self, "summary_days"):
+            return self.summary_days
+        return self.itinerary.aggregate(total=models.Sum("days"))["total"] or 0
 
     @property
     def porter(self):
@@ -113,13 +133,29 @@ class Package(BasePackage):
 
     @property
     def default_porter(self):
-        if self.porters.count() > 0:
-            return self.porters.all()[0]
+        if not hasattr(self, "_default_porter"):
+            self._default_porter = self._get_default("porters", "summary_porter_id")
+        return self._default_porter
 
     @property
     def default_guide(self):
-        if self.guides.count() > 0:
-            return self.guides.all()[0]
+        if not hasattr(self, "_default_guide"):
+            self._default_guide = self._get_default("guides", "summary_guide_id")
+        return self._default_guide
+
+    def _get_default(self, relation, annotation):
+        """
+        Returns the first related object of the given many-to-many
+        relation, reusing the id annotated by ``with_summary()`` when
+        present so packages without one don't query at all.
+        """
+        related = getattr(self, relation)
+        if not hasattr(self, annotation):
+            return related.order_by("id").first()
+        related_id = getattr(self, annotation)
+        if related_id is None:
+            return None
+        return related.model.objects.filter(id=related_id).first()
 
     class Meta:
         verbose_name = _("Package")
@@ -140,6 +176,15 @@ class Package(BasePackage):
         self.titles = self.title
         super(Package, self).save(*args, **kwargs)
 
+    def saved_fields(self):
+        """
+        The summary columns are left out of updates too, since they're
+        only written by ``PackageManager.refresh_summary`` and the
+        instance's values may be out of date.
+        """
+        return [name for name in super(Package, self).saved_fields()
+                if name not in self.summary_fields]
+
     def description_from_content(self):
         """
         Return first 40 words as summarized description.
@@ -147,20 +192,12 @@ class Package(BasePackage):
 
         return " ".join(self.content.split()[:40])
 
-    # def get_absolute_url(self):
-    #     """
-    #     URL for a package - for ``Link`` package types, simply return its
-    #     slug since these don't have an actual URL pattern. Also handle
-    #     the special case of the homepackage being a package object.
-    #     """
-    #     slug = self.slug
-    #     if self.content_model == "link":
-    #         slug = urljoin('/', slug)
-    #         return slug
-    #     if slug == "/":
-    #         return reverse("home")
-    #     else:
-    #         return reverse("package", kwargs={"slug": slug})
+    def get_absolute_url(self):
+        """
+        URL of the package's page on the frontend, which is served
+        separately from this site, following ``PACKAGE_URL_FORMAT``.
+        """
+        return settings.PACKAGE_URL_FORMAT % {"slug": self.slug}
 
     def get_ascendants(self, for_user=None):
         """
@@ -178,7 +215,14 @@ class Package(BasePackage):
                 self._ascendants = packages[0]._ascendants
             else:
                 self._ascendants = []
+        if not self._ascendants and self.has_tree_path():
+            # Slugs don't follow the tree, so load the ascendants via
+            # ``tree_path`` instead.
+            ascendants = Package.objects.ancestors(self)
+            self._ascendants = list(ascendants)[::-1]
         if not self._ascendants:
+            # ``tree_path`` wasn't written, for example after
+            # ``loaddata`` or ``update()``, so walk the parents.
             child = self
             while child.parent_id is not None:
                 self._ascendants.append(child.parent)
@@ -448,6 +492,16 @@ class Price(models.Model):
     def __str__(self):
         return "{} [Rs.{} x {}]".format(self.package.title, self.discounted_price, self.min_group_size)
 
+    def save(self, *args, **kwargs):
+        """
+        Keep the ``Departure`` rows for ``starting_date`` and the
+        package's summary columns in sync.
+        """
+        with transaction.atomic(using=kwargs.get("using")):
+            super(Price, self).save(*args, **kwargs)
+            Departure.objects.sync(self)
+            Package.objects.refresh_summary([self.package_id])
+
     @property
     def standard_text(self):
         try:
@@ -464,6 +518,35 @@ class Price(models.Model):
         ordering = ['package', '-discounted_price']
 
 
+class Departure(models.Model):
+    """
+    A date from ``Price.starting_date``, normalized so availability
+    by date and group size can be queried across the whole catalog
+    from an index. Maintained by ``Price.save``. Departures that are
+    no longer offered but have bookings are kept, inactive.
+    """
+    price = models.ForeignKey('Price', related_name='departures', on_delete=models.CASCADE)
+    package = models.ForeignKey('Package', related_name='departures', on_delete=models.CASCADE)
+    date = models.DateField(_("Date"))
+    min_group_size = models.PositiveSmallIntegerField(default=1)
+    max_group_size = models.PositiveSmallIntegerField()
+    is_active = models.BooleanField(default=True)
+
+    objects = DepartureManager()
+
+    def __str__(self):
+        return "{} [{}]".format(self.price, self.date)
+
+    class Meta:
+        verbose_name = _("Departure")
+        verbose_name_plural = _("Departures")
+        ordering = ['date']
+        unique_together = ('price', 'date')
+        indexes = [
+            models.Index(fields=['date', 'max_group_size', 'min_group_size']),
+        ]
+
+
 class Porter(models.Model):
     """
     Number of porter required.
@@ -504,6 +587,27 @@ class Guide(models.Model):
         verbose_name_plural = _("Guides")
 
 
+@receiver(post_delete, sender=Price)
+@receiver(post_save, sender=PackageItinerary)
+@receiver(post_delete, sender=PackageItinerary)
+def package_summary_changed(sender, instance, **kwargs):
+    """
+    Refresh the package's summary columns when a price is deleted or
+    its itinerary changes. Saving a price refreshes them in
+    ``Price.save``, once its departures are in sync.
+    """
+    Package.objects.refresh_summary([instance.package_id])
+
+
+@receiver(post_save, sender=ItineraryItem)
+def itinerary_item_changed(sender, instance, **kwargs):
+    """
+    Refresh the total days of packages that include the item.
+    """
+    items = PackageItinerary.objects.filter(item=instance)
+    Package.objects.refresh_summary(items.values_list("package_id", flat=True))
+
+
 GALLERIES_UPLOAD_DIR = "packages"
 if settings.PACKAGE_NAME_FILEBROWSER in settings.INSTALLED_APPS:
     fb_settings = "%s.settings" % settings.PACKAGE_NAME_FILEBROWSER
@@ -562,47 +666,139 @@ class Article(RichText):
 
     def save(self, delete_zip_import=True, *args, **kwargs):
         """
-        If a zip file is uploaded, extract any images from it and add
-        them to the article-gallery, before removing the zip file.
+        If a zip file is uploaded, queue the import of its images into
+        the article-gallery once the article is committed. See
+        ``import_zip``.
         """
         super(Article, self).save(*args, **kwargs)
         if self.zip_import:
-            zip_file = ZipFile(self.zip_import)
-            for name in zip_file.namelist():
-                data = zip_file.read(name)
-                try:
-                    from PIL import Image
-                    image = Image.open(BytesIO(data))
-                    image.load()
-                    image = Image.open(BytesIO(data))
-                    image.verify()
-                except ImportError:
-                    pass
-                except:
-                    continue
-                name = os.path.split(name)[1]
-                if isinstance(name, bytes):
-                    tempname = name.decode('utf-8')
-                else:
-                    tempname = name
-
-                slug = self.slug if self.slug != "/" else ""
-                path = os.path.join(GALLERIES_UPLOAD_DIR, slug, tempname)
-                try:
-                    saved_path = default_storage.save(path, ContentFile(data))
-                except UnicodeEncodeError:
-                    from warnings import warn
-                    warn("A file was saved that contains unicode "
-                         "characters in its path, but somehow the current "
-                         "locale does not support utf-8. You may need to set "
-                         "'LC_ALL' to a correct value, eg: 'en_US.UTF-8'.")
-                    path = os.path.join(GALLERIES_UPLOAD_DIR, slug,
-                                        native(str(name, errors="ignore")))
-                    saved_path = default_storage.save(path, ContentFile(data))
-                self.images.add(ArticleGalleryImage(file=saved_path))
-            if delete_zip_import:
-                zip_file.close()
-                self.zip_import.delete(save=True)
+            transaction.on_commit(
+                lambda: self.queue_zip_import(delete_zip_import))
+
+    def queue_zip_import(self, delete_zip_import=True):
+        """
+        Queues ``import_article_zip``, unless an import for the article
+        is already queued or running, so saving the article again
+        before the import is done doesn't import the zip twice. The
+        task clears the queued flag once it's done.
+        """
+        from simplifytour.packages.tasks import import_article_zip
+        if cache.add(self.zip_import_queued_key(), True,
+                     settings.GALLERY_IMPORT_QUEUE_TIMEOUT):
+            self.set_zip_import_progress(status="queued")
+            import_article_zip.delay(self.id,
+                                     delete_zip_import=delete_zip_import)
+
+    def zip_import_queued_key(self):
+        return "simplifytour.packages.article.%s.zip_import_queued" % self.id
+
+    def zip_import_progress_key(self):
+        return "simplifytour.packages.article.%s.zip_import" % self.id
+
+    def zip_import_progress(self):
+        """
+        Returns a dict describing the last zip import for this article:
+        its ``status`` (queued, running, done or failed), and the number
+        of image files ``total``, ``processed``, ``imported`` and
+        ``skipped`` as invalid so far. Returns ``None`` if there's no
+        import to report on.
+        """
+        return cache.get(self.zip_import_progress_key())
+
+    def set_zip_import_progress(self, **progress):
+        cache.set(self.zip_import_progress_key(), progress,
+                  settings.GALLERY_IMPORT_PROGRESS_TIMEOUT)
+
+    def _save_zip_member(self, zip_path, info):
+        """
+        Validates one zip member as an image and streams it into
+        storage, returning the saved path, or ``None`` if it isn't a
+        valid image. Each call opens its own ``ZipFile`` so members can
+        be processed from several threads.
+        """
+        with ZipFile(zip_path) as zip_file, zip_file.open(info) as data:
+            try:
+                from PIL import Image
+                Image.open(data).verify()
+            except ImportError:
+                pass
+            except:
+                return None
+            data.seek(0)
+            name = os.path.split(info.filename)[1]
+            slug = getattr(self, "slug", "")
+            slug = slug if slug != "/" else ""
+            path = os.path.join(GALLERIES_UPLOAD_DIR, slug, name)
+            try:
+                return default_storage.save(path, File(data))
+            except UnicodeEncodeError:
+                from warnings import warn
+                warn("A file was saved that contains unicode "
+                     "characters in its path, but somehow the current "
+                     "locale does not support utf-8. You may need to set "
+                     "'LC_ALL' to a correct value, eg: 'en_US.UTF-8'.")
+                path = os.path.join(GALLERIES_UPLOAD_DIR, slug,
+                                    name.encode("ascii", "ignore").decode())
+                data.seek(0)
+                return default_storage.save(path, File(data))
+
+    def import_zip(self, delete_zip_import=True):
+        """
+        Extract any images from the uploaded zip file and add them to
+        the article-gallery, before removing the zip file. The zip is
+        copied to a local temporary file in chunks, then its members
+        are validated and uploaded by up to ``GALLERY_IMPORT_WORKERS``
+        threads, streaming each one rather than reading it into memory.
+        The gallery images are created with a single ``bulk_create``,
+        and progress is reported via ``zip_import_progress``.
+        """
+        progress = {"status": "running", "total": 0, "processed": 0,
+                    "imported": 0, "skipped": 0}
+        with NamedTemporaryFile(suffix=".zip") as zip_copy:
+            self.zip_import.open("rb")
+            try:
+                for chunk in self.zip_import.chunks():
+                    zip_copy.write(chunk)
+            finally:
+                self.zip_import.close()
+            zip_copy.flush()
+            with ZipFile(zip_copy.name) as zip_file:
+                members = [i for i in zip_file.infolist() if not i.is_dir()]
+            progress["total"] = len(members)
+            self.set_zip_import_progress(**progress)
+
+            saved = {}
+            workers = settings.GALLERY_IMPORT_WORKERS
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = dict((executor.submit(self._save_zip_member,
+                                                zip_copy.name, info), i)
+                               for i, info in enumerate(members))
+                for future in as_completed(futures):
+                    saved_path = future.result()
+                    if saved_path:
+                        saved[futures[future]] = saved_path
+                        progress["imported"] += 1
+                    else:
+                        progress["skipped"] += 1
+                    progress["processed"] += 1
+                    self.set_zip_import_progress(**progress)
+
+        order = ArticleGalleryImage.objects.filter(
+            article=self, _order__isnull=False).count()
+        images = []
+        for i in sorted(saved):
+            image = ArticleGalleryImage(article=self, file=saved[i],
+                                        _order=order + len(images))
+            image.set_default_title()
+            images.append(image)
+        ArticleGalleryImage.objects.bulk_create(images)
+
+        if delete_zip_import:
+            self.zip_import.delete(save=False)
+            Article.objects.filter(id=self.id).update(zip_import="")
+        progress["status"] = "done"
+        self.set_zip_import_progress(**progress)
+        return images
 
 
 class ArticleGalleryImage(Orderable):
@@ -615,6 +811,7 @@ class ArticleGalleryImage(Orderable):
     class Meta:
         verbose_name = _("Image")
         verbose_name_plural = _("Images")
+        order_with_respect_to = "article"
 
     def __str__(self):
         return self.description
@@ -625,7 +822,17 @@ class ArticleGalleryImage(Orderable):
         file name.
         """
 
-        if not self.id and not self.title:
+        if not self.id:
+            self.set_default_title()
+        super(ArticleGalleryImage, self).save(*args, **kwargs)
+
+    def set_default_title(self):
+        """
+        Create the title from the file name, and the description from
+        the title, if not given. Also used by ``Article.import_zip``,
+        which creates images without calling ``save``.
+        """
+        if not self.title:
             name = force_text(self.file.name)
             name = name.rsplit("/", 1)[-1].rsplit(".", 1)[0]
             name = name.replace("'", "")
@@ -634,11 +841,9 @@ class ArticleGalleryImage(Orderable):
                             for i, s in enumerate(name)])
             self.title = name
 
-        if not self.id and not self.description:
+        if not self.description:
             self.description = self.title
 
-        super(ArticleGalleryImage, self).save(*args, **kwargs)
-
 
 
 
@@ -0,0 +1,177 @@
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Sum
+
+from simplifytour.packages.models import (Guide, Package, PackageAddons,
+                                          Porter, Price)
+
+
+def _decimal(value):
+    """
+    Converts a quoted amount back to a ``Decimal`` rounded to the
+    precision of the price fields, or ``None`` for NaN (no price).
+    """
+    if np.isnan(value):
+        return None
+    return Decimal(str(round(float(value), 2))).quantize(Decimal("0.01"))
+
+
+class QuoteEngine(object):
+    """
+    Quotes packages in batches. The prices, porter and guide rates
+    and addon totals for ``packages`` (ids or a queryset) are loaded
+    once, in a handful of queries, into arrays, so quotes for any
+    number of (package, standard, group size) combinations are
+    computed with NumPy rather than per package in Python.
+
+    A quote for a group of ``n`` is made up of:
+
+    - ``price``: ``n`` times the cheapest unarchived ``Price`` for the
+      standard whose group size bounds include ``n``. The per person
+      price is ``discounted_price``, or ``marked_price`` less
+      ``reduced_by`` percent if there's no discounted price.
+    - ``porter``: if ``porter_required``, one default porter per
+      ``Porter.ratio`` travellers at ``Porter.rate`` for
+      ``porter_days``.
+    - ``guide``: if ``guide_required``, the default guide at
+      ``Guide.rate`` for ``guide_days``.
+    - ``addons``: ``n`` times the ``ItineraryItem.price`` of the
+      package's addons, when requested.
+
+    The default porter and guide are the ones used by
+    ``Package.default_porter`` and ``Package.default_guide``.
+    """
+
+    def __init__(self, packages):
+        if hasattr(packages, "values_list"):
+            packages = packages.values_list("id", flat=True)
+        rows = Package.objects.filter(pk__in=list(packages)).with_summary()
+        rows = sorted(rows.values_list(
+            "id", "porter_required", "porter_days", "summary_porter_id",
+            "guide_required", "guide_days", "summary_guide_id"))
+        self.package_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        porters = dict((id, (ratio, rate)) for id, ratio, rate in
+                       Porter.objects.filter(id__in=[row[3] for row in rows])
+                       .values_list("id", "ratio", "rate"))
+        guides = dict(Guide.objects.filter(id__in=[row[6] for row in rows])
+                      .values_list("id", "rate"))
+        addons = dict(PackageAddons.objects
+                      .filter(package_id__in=self.package_ids.tolist())
+                      .order_by().values("package_id")
+                      .annotate(total=Sum("item__price"))
+                      .values_list("package_id", "total"))
+
+        # Per package arrays, indexed by position in ``package_ids``.
+        porter_ratio, porter_cost, guide_cost, addon_cost = [], [], [], []
+        for (id, porter_required, porter_days, porter_id, guide_required,
+                guide_days, guide_id) in rows:
+            ratio, rate = porters.get(porter_id, (None, None))
+            porter_ratio.append(float(ratio or 1))
+            porter_cost.append(float(rate or 0) * porter_days
+                               if porter_required else 0)
+            guide_rate = guides.get(guide_id)
+            guide_cost.append(float(guide_rate or 0) * guide_days
+                              if guide_required else 0)
+            addon_cost.append(float(addons.get(id) or 0))
+        self.porter_ratio = np.array(porter_ratio, dtype=np.float64)
+        self.porter_cost = np.array(porter_cost, dtype=np.float64)
+        self.guide_cost = np.array(guide_cost, dtype=np.float64)
+        self.addon_cost = np.array(addon_cost, dtype=np.float64)
+
+        # Per price arrays, grouped by package so each package's
+        # prices are the slice ``price_start[i]:price_start[i + 1]``.
+        prices = Price.objects.filter(package_id__in=self.package_ids.tolist(),
+                                      is_archived=False)
+        prices = list(prices.order_by("package_id", "id").values_list(
+            "package_id", "standard", "discounted_price", "marked_price",
+            "reduced_by", "min_group_size", "max_group_size"))
+        unit = []
+        for _, _, discounted, marked, reduced_by, _, _ in prices:
+            if discounted is not None:
+                unit.append(float(discounted))
+            elif marked is not None:
+                unit.append(float(marked) * (1 - float(reduced_by or 0) / 100))
+            else:
+                unit.append(np.nan)
+        self.price_unit = np.array(unit, dtype=np.float64)
+        self.price_package = self._index([p[0] for p in prices])
+        self.price_standard = np.array([p[1] for p in prices], dtype=np.int64)
+        self.price_min = np.array([p[5] for p in prices], dtype=np.int64)
+        self.price_max = np.array([p[6] for p in prices], dtype=np.int64)
+        counts = np.bincount(self.price_package, minlength=len(rows))
+        self.price_start = np.concatenate(([0], np.cumsum(counts)))
+
+    def _index(self, package_ids):
+        """
+        Positions of ``package_ids`` in ``self.package_ids``. Raises
+        ``KeyError`` for packages the engine hasn't loaded.
+        """
+        package_ids = np.asarray(package_ids, dtype=np.int64)
+        index = np.searchsorted(self.package_ids, package_ids)
+        index = np.minimum(index, max(len(self.package_ids) - 1, 0))
+        if len(package_ids) and (not len(self.package_ids) or
+                                 (self.package_ids[index] != package_ids).any()):
+            raise KeyError("Packages not loaded by the quote engine")
+        return index
+
+    def quote(self, package_ids, standards, group_sizes, addons=False):
+        """
+        Quotes each (package, standard, group size) combination given
+        by the equal length sequences. Returns a dict of float arrays
+        for ``price``, ``porter``, ``guide``, ``addons`` and
+        ``total``. ``price`` and ``total`` are NaN where no price
+        accepts the group.
+        """
+        index = self._index(package_ids)
+        standards = np.asarray(standards, dtype=np.int64)
+        group_sizes = np.asarray(group_sizes, dtype=np.int64)
+
+        # Pair every combination with each price of its package, and
+        # keep the cheapest price matching the standard and group size.
+        starts = self.price_start[index]
+        counts = self.price_start[index + 1] - starts
+        combo = np.repeat(np.arange(len(index)), counts)
+        offsets = np.arange(len(combo)) - np.repeat(np.cumsum(counts) - counts,
+                                                    counts)
+        price = starts[combo] + offsets
+        size = group_sizes[combo]
+        matches = ((self.price_standard[price] == standards[combo]) &
+                   (self.price_min[price] <= size) &
+                   (self.price_max[price] >= size) &
+                   ~np.isnan(self.price_unit[price]))
+        unit = np.full(len(index), np.inf)
+        np.minimum.at(unit, combo[matches], self.price_unit[price[matches]])
+        unit[np.isinf(unit)] = np.nan
+
+        quote = {
+            "price": unit * group_sizes,
+            "porter": (np.ceil(group_sizes / self.porter_ratio[index]) *
+                       self.porter_cost[index]),
+            "guide": self.guide_cost[index],
+            "addons": (self.addon_cost[index] * group_sizes if addons else
+                       np.zeros(len(index))),
+        }
+        quote["total"] = (quote["price"] + quote["porter"] + quote["guide"] +
+                          quote["addons"])
+        return quote
+
+    def from_prices(self, group_size=None):
+        """
+        The lowest total per person for each loaded package, as a
+        dict of package id to ``Decimal`` (``None`` without a price).
+        Each price is quoted at ``group_size``, or at its own
+        ``min_group_size`` (and at least one traveller) when no group
+        size is given.
+        """
+        sizes = (np.maximum(self.price_min, 1) if group_size is None else
+                 np.full(len(self.price_package), group_size, np.int64))
+        quote = self.quote(self.package_ids[self.price_package],
+                           self.price_standard, sizes)
+        per_person = quote["total"] / np.maximum(sizes, 1)
+        lowest = np.full(len(self.package_ids), np.inf)
+        valid = ~np.isnan(per_person)
+        np.minimum.at(lowest, self.price_package[valid], per_person[valid])
+        lowest[np.isinf(lowest)] = np.nan
+        return dict((int(id), _decimal(value))
+                    for id, value in zip(self.package_ids, lowest))
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent by ``DepartureManager.sync`` once the departures for ``price``
+# match its ``starting_date`` list and group size bounds.
+departures_synced = Signal(providing_args=["price"])
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+
+from config import celery_app
+
+from simplifytour.packages.models import Article
+
+
+@celery_app.task()
+def import_article_zip(article_id, delete_zip_import=True):
+    """
+    Imports the images in an article's uploaded zip file into its
+    gallery. Queued by ``Article.queue_zip_import``, whose queued
+    flag is cleared once the import is done.
+    """
+    try:
+        article = Article.objects.get(id=article_id)
+    except Article.DoesNotExist:
+        return 0
+    try:
+        if not article.zip_import:
+            return 0
+        try:
+            images = article.import_zip(delete_zip_import=delete_zip_import)
+        except Exception:
+            progress = article.zip_import_progress() or {}
+            progress["status"] = "failed"
+            article.set_zip_import_progress(**progress)
+            raise
+        return len(images)
+    finally:
+        cache.delete(article.zip_import_queued_key())
@@ -1,3 +1,315 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock
+from zipfile import ZipFile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+import numpy as np
+
+from simplifytour.packages.models import (
+    BUDGET_COST, STANDARD_COST, Article, Guide, ItineraryItem, Package,
+    PackageAddons, PackageItinerary, Porter, Price
+)
+from simplifytour.packages.quotes import QuoteEngine
+from simplifytour.packages.tasks import import_article_zip
+
+
+class PackageTreeTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="guide@example.com")
+        self.root = self.create_package("Nepal")
+        self.child = self.create_package("Annapurna", parent=self.root)
+        self.grandchild = self.create_package("Annapurna Circuit",
+                                              parent=self.child)
+
+    def create_package(self, title, **fields):
+        return Package.objects.create(title=title, content="",
+                                      provided_by=self.user, site_id=1,
+                                      **fields)
+
+    def descendant_counts(self):
+        return dict(Package.objects.with_descendant_count().values_list(
+            "title", "descendant_count"))
+
+    def test_tree(self):
+        self.assertEqual(list(Package.objects.ancestors(self.grandchild)),
+                         [self.root, self.child])
+        self.assertEqual(set(Package.objects.descendants(self.root)),
+                         {self.child, self.grandchild})
+        self.assertEqual(self.descendant_counts(), {
+            "Nepal": 2, "Annapurna": 1, "Annapurna Circuit": 0})
+        self.assertEqual(self.grandchild.get_ascendants(),
+                         [self.child, self.root])
+
+    def test_move(self):
+        everest = self.create_package("Everest", parent=self.root)
+        self.child.parent = everest
+        self.child.save()
+        grandchild = Package.objects.get(pk=self.grandchild.pk)
+        self.assertEqual(list(Package.objects.ancestors(grandchild)),
+                         [self.root, everest, self.child])
+        self.assertEqual(set(Package.objects.descendants(everest)),
+                         {self.child, grandchild})
+        self.assertEqual(self.descendant_counts(), {
+            "Nepal": 3, "Everest": 2, "Annapurna": 1,
+            "Annapurna Circuit": 0})
+
+    def test_save_stale_descendant(self):
+        """
+        Saving a descendant loaded before its ancestor moved keeps the
+        path written by the move.
+        """
+        stale = Package.objects.get(pk=self.grandchild.pk)
+        everest = self.create_package("Everest", parent=self.root)
+        self.child.parent = everest
+        self.child.save()
+        stale.title = "Annapurna Circuit Trek"
+        stale.save()
+        grandchild = Package.objects.get(pk=self.grandchild.pk)
+        self.assertEqual(grandchild.title, "Annapurna Circuit Trek")
+        self.assertEqual(list(Package.objects.ancestors(grandchild)),
+                         [self.root, everest, self.child])
+        self.assertEqual(set(Package.objects.descendants(everest)),
+                         {self.child, grandchild})
+
+    def test_ascendants_without_tree_path(self):
+        """
+        Objects moved or created without ``save`` have no up to date
+        ``tree_path``, so their parents are walked instead.
+        """
+        Package.objects.filter(pk=self.grandchild.pk).update(
+            parent=self.root)
+        grandchild = Package.objects.get(pk=self.grandchild.pk)
+        self.assertEqual(grandchild.get_ascendants(), [self.root])
+        Package.objects.filter(pk=self.grandchild.pk).update(tree_path="")
+        grandchild = Package.objects.get(pk=self.grandchild.pk)
+        self.assertEqual(grandchild.get_ascendants(), [self.root])
+
+
+class PackageSummaryTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create(email="guide@example.com")
+        self.package = Package.objects.create(title="Annapurna Circuit",
+                                              content="", provided_by=user,
+                                              site_id=1)
+
+    def test_save_keeps_summary(self):
+        """
+        Saving an instance loaded before its prices changed doesn't
+        overwrite the summary columns.
+        """
+        stale = Package.objects.get(pk=self.package.pk)
+        Price.objects.create(package=self.package, discounted_price=100,
+                             min_group_size=1, max_group_size=8,
+                             price_notes="Autumn",
+                             starting_date=[date(2026, 10, 1)])
+        stale.title = "Annapurna Circuit Trek"
+        stale.save()
+        package = Package.objects.get(pk=self.package.pk)
+        self.assertEqual(package.title, "Annapurna Circuit Trek")
+        self.assertEqual(package.min_price, 100)
+        self.assertEqual(package.max_group_size, 8)
+        self.assertEqual(package.departure_count, 1)
+
+    def summary(self):
+        return Package.objects.filter(pk=self.package.pk).values_list(
+            "min_price", "max_group_size", "total_days",
+            "departure_count").get()
+
+    def test_refresh_after_price_deleted(self):
+        item = ItineraryItem.objects.create(title="Day 1", description="",
+                                            days=3,
+                                            provided_by=self.package.provided_by)
+        PackageItinerary.objects.create(package=self.package, item=item)
+        expensive = Price.objects.create(
+            package=self.package, discounted_price=100, min_group_size=1,
+            max_group_size=8, price_notes="Autumn",
+            starting_date=[date(2026, 10, 1), date(2026, 10, 8)])
+        cheap = Price.objects.create(
+            package=self.package, discounted_price=80, min_group_size=1,
+            max_group_size=12, price_notes="Winter",
+            starting_date=[date(2026, 12, 1)])
+        self.assertEqual(self.summary(), (80, 12, 3, 3))
+        cheap.delete()
+        self.assertEqual(self.summary(), (100, 8, 3, 2))
+        Price.objects.filter(pk=expensive.pk).delete()
+        self.assertEqual(self.summary(), (None, None, 3, 0))
+
+    def test_refresh_summary(self):
+        """
+        Changes made with ``QuerySet.update`` are picked up by
+        calling ``refresh_summary`` for the packages.
+        """
+        price = Price.objects.create(package=self.package,
+                                     discounted_price=100, min_group_size=1,
+                                     max_group_size=8, price_notes="Autumn",
+                                     starting_date=[date(2026, 10, 1)])
+        Price.objects.filter(pk=price.pk).update(discounted_price=60,
+                                                 max_group_size=6)
+        self.assertEqual(self.summary(), (100, 8, 0, 1))
+        Package.objects.refresh_summary([self.package.pk, None])
+        self.assertEqual(self.summary(), (60, 6, 0, 1))
+
+
+class QuoteEngineTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(email="guide@example.com")
+        porter = Porter.objects.create(ratio=Decimal("2.5"), count=2, rate=15,
+                                       remarks="Porters")
+        guide = Guide.objects.create(language="English", rate=30,
+                                     remarks="Guide")
+        self.package = self.create_package("Annapurna Circuit",
+                                           porter_required=True,
+                                           porter_days=3, guide_required=True,
+                                           guide_days=2)
+        self.package.porters.add(porter)
+        self.package.guides.add(guide)
+        addon = ItineraryItem.objects.create(title="Rafting", description="",
+                                             price=20, provided_by=self.user)
+        PackageAddons.objects.create(package=self.package, item=addon)
+        self.create_price(self.package, discounted_price=100,
+                          min_group_size=1, max_group_size=8)
+        self.create_price(self.package, marked_price=120, reduced_by=25,
+                          min_group_size=4, max_group_size=10)
+        self.create_price(self.package, standard=STANDARD_COST,
+                          discounted_price=200, min_group_size=1,
+                          max_group_size=4)
+        self.create_price(self.package, discounted_price=10,
+                          min_group_size=1, max_group_size=10,
+                          is_archived=True)
+        self.unpriced = self.create_package("Everest Base Camp")
+        self.walk_in = self.create_package("Poon Hill", guide_required=True,
+                                           guide_days=1)
+        self.walk_in.guides.add(guide)
+        self.create_price(self.walk_in, discounted_price=50,
+                          min_group_size=0, max_group_size=4)
+
+    def create_package(self, title, **fields):
+        return Package.objects.create(title=title, content="",
+                                      provided_by=self.user, site_id=1,
+                                      **fields)
+
+    def create_price(self, package, **fields):
+        fields.setdefault("standard", BUDGET_COST)
+        return Price.objects.create(package=package, price_notes="Autumn",
+                                    starting_date=[date(2026, 10, 1)],
+                                    **fields)
+
+    def test_quote(self):
+        """
+        Porters are rounded up to whole porters per ``Porter.ratio``
+        travellers (45 each for 3 days at 15), with the guide at 60
+        for 2 days and addons at 20 per traveller.
+        """
+        engine = QuoteEngine(Package.objects.all())
+        quote = engine.quote(
+            [self.package.id] * 5 + [self.unpriced.id],
+            [BUDGET_COST, BUDGET_COST, BUDGET_COST, STANDARD_COST,
+             BUDGET_COST, BUDGET_COST],
+            [3, 5, 6, 3, 11, 2], addons=True)
+        np.testing.assert_array_equal(quote["price"],
+                                      [300, 450, 540, 600, np.nan, np.nan])
+        np.testing.assert_array_equal(quote["porter"],
+                                      [90, 90, 135, 90, 225, 0])
+        np.testing.assert_array_equal(quote["guide"], [60, 60, 60, 60, 60, 0])
+        np.testing.assert_array_equal(quote["addons"],
+                                      [60, 100, 120, 60, 220, 0])
+        np.testing.assert_array_equal(quote["total"],
+                                      [510, 700, 855, 810, np.nan, np.nan])
+
+    def test_quote_without_addons(self):
+        engine = QuoteEngine([self.package.id])
+        quote = engine.quote([self.package.id], [BUDGET_COST], [3])
+        self.assertEqual(quote["addons"].tolist(), [0])
+        self.assertEqual(quote["total"].tolist(), [450])
+
+    def test_from_prices(self):
+        """
+        Without a group size, each price is quoted at its minimum group
+        size: 205 for one, 510 / 4 for four and 305 for one at the
+        standard rate. A ``min_group_size`` of 0 is quoted for one
+        traveller.
+        """
+        engine = QuoteEngine(Package.objects.all())
+        self.assertEqual(engine.from_prices(), {
+            self.package.id: Decimal("127.50"),
+            self.unpriced.id: None,
+            self.walk_in.id: Decimal("80.00"),
+        })
+
+    def test_from_prices_group_size(self):
+        """
+        A group of 7 needs three porters: 895 / 7 at 100 per person,
+        and 825 / 7 at 120 less 25%, rounded to the cent.
+        """
+        engine = QuoteEngine([self.package.id, self.walk_in.id])
+        self.assertEqual(engine.from_prices(group_size=7), {
+            self.package.id: Decimal("117.86"),
+            self.walk_in.id: None,
+        })
+
+    def test_unloaded_package(self):
+        engine = QuoteEngine([self.package.id])
+        with self.assertRaises(KeyError):
+            engine.quote([self.unpriced.id], [BUDGET_COST], [2])
+
+
+class ZipImportTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        delay = mock.patch.object(import_article_zip, "delay")
+        self.delay = delay.start()
+        self.addCleanup(delay.stop)
+
+    def test_queued_once(self):
+        """
+        Saving an article again before its zip import has run doesn't
+        queue a second import.
+        """
+        article = Article.objects.create(content="",
+                                         zip_import="packages/photos.zip")
+        article.save()
+        self.assertEqual(self.delay.call_count, 1)
+        self.assertEqual(article.zip_import_progress(), {"status": "queued"})
+        with mock.patch.object(Article, "import_zip", return_value=[]):
+            import_article_zip(article.id)
+        article.save()
+        self.assertEqual(self.delay.call_count, 2)
+
+    def test_gallery_order_per_article(self):
+        """
+        Imported images are ordered after the existing images of their
+        own article, whatever other articles hold.
+        """
+        media_root = mkdtemp()
+        self.addCleanup(rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            for title in ("Everest", "Langtang"):
+                article = Article.objects.create(content="")
+                article.zip_import.save("photos.zip", self.zip_file(title),
+                                        save=False)
+                article.import_zip(delete_zip_import=False)
+                article.import_zip()
+                self.assertEqual(list(article.images.values_list(
+                    "_order", flat=True)), [0, 1, 2, 3])
+
+    def zip_file(self, name):
+        data = BytesIO()
+        with ZipFile(data, "w") as zip_file:
+            for i in range(2):
+                image = BytesIO()
+                Image.new("RGB", (1, 1)).save(image, "PNG")
+                zip_file.writestr("%s-%s.png" % (name, i), image.getvalue())
+        return ContentFile(data.getvalue())
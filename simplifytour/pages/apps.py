@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class PagesConfig(AppConfig):
@@ -7,3 +8,7 @@ class PagesConfig(AppConfig):
 
     def ready(self):
         from . import checks  # noqa
+        from .models import Page, page_changed
+        for model in [Page] + Page.get_content_models():
+            post_save.connect(page_changed, sender=model)
+            post_delete.connect(page_changed, sender=model)
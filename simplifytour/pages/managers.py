@@ -1,13 +1,42 @@
 from __future__ import unicode_literals
 from future.builtins import range
 
+from collections import defaultdict
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils.timezone import now
+
 from simplifytour.conf import settings
-from simplifytour.core.managers import DisplayableManager
+from simplifytour.core.managers import DisplayableManager, TreeManager
+from simplifytour.utils.cache import bump_cache_version, get_cache_version
 from simplifytour.utils.urls import home_slug
 from simplifytour.utils.deprecation import is_authenticated
 
 
-class PageManager(DisplayableManager):
+MENU_VERSION_CACHE_KEY = "simplifytour.pages.menu_version.%s"
+MENU_TREE_CACHE_KEY = "simplifytour.pages.menu_tree.%s.%s.%s"
+
+
+def get_menu_version(site_id):
+    """
+    Returns the version of the site's pages used in the cache key of
+    the page menu tree.
+    """
+    return get_cache_version(MENU_VERSION_CACHE_KEY % site_id)
+
+
+def bump_menu_version(site_id):
+    """
+    Marks the site's pages as changed, so the page menu tree is
+    rebuilt on next use. Called when a page is saved, deleted or
+    reordered.
+    """
+    bump_cache_version(MENU_VERSION_CACHE_KEY % site_id)
+
+
+class PageManager(DisplayableManager, TreeManager):
 
     def published(self, for_user=None, include_login_required=False):
         """
@@ -29,6 +58,80 @@ class PageManager(DisplayableManager):
             published = published.exclude(login_required=True)
         return published
 
+    def menu_tree(self, for_user=None):
+        """
+        Returns the published pages used by the ``page_menu`` tag as a
+        dict mapping parent IDs to lists of their child pages, in menu
+        order. Which pages are published only differs between staff,
+        anonymous and other users, so the tree is cached for each of
+        those per site and menu version, and until the next page is
+        due to be published or to expire. The cache holds the values of
+        every concrete ``Page`` field for each page, and the page
+        instances are built from them on each call, so each request
+        has its own.
+        """
+        if for_user is not None and for_user.is_staff:
+            user_class = "staff"
+        elif for_user is not None and not is_authenticated(for_user):
+            user_class = "anonymous"
+        else:
+            user_class = "user"
+        site_id = Site.objects.get_current().id
+        key = MENU_TREE_CACHE_KEY % (site_id, get_menu_version(site_id),
+                                     user_class)
+        fields = [f.attname for f in self.model._meta.concrete_fields]
+        tree = cache.get(key)
+        if tree is None:
+            published = self.published(for_user=for_user).order_by("_order")
+            parent_index = fields.index("parent_id")
+            branches = defaultdict(list)
+            for row in published.values_list(*fields):
+                branches[row[parent_index]].append(row)
+            tree = tuple((parent_id, tuple(rows))
+                         for parent_id, rows in branches.items())
+            cache.set(key, tree, self._menu_tree_timeout())
+        content_models = dict((m.get_content_model_name(), m)
+                              for m in self.model.get_content_models()
+                              if not m._meta.proxy)
+        return dict((parent_id, [self._menu_page(fields, row, content_models)
+                                 for row in rows])
+                    for parent_id, rows in tree)
+
+    def _menu_page(self, fields, row, content_models):
+        """
+        Builds a page from a row of the cached menu tree. The page's
+        content model instance is built from the same row and cached
+        on it, so ``get_content_model`` doesn't need a query. Fields
+        only defined on the content model are deferred, and loaded
+        when first accessed.
+        """
+        page = self.model.from_db(self.db, fields, row)
+        name = page.content_model
+        related = getattr(getattr(self.model, name or "", None),
+                          "related", None)
+        if name in content_models and related is not None:
+            ptr = related.field.attname
+            content = content_models[name].from_db(
+                self.db, fields + [ptr], row + (page.pk,))
+            related.set_cached_value(page, content)
+        return page
+
+    def _menu_tree_timeout(self):
+        """
+        Seconds until the next page is published or expires, capped
+        at ``PAGE_MENU_CACHE_TIMEOUT``.
+        """
+        current = now()
+        upcoming = self.aggregate(
+            publish=Min("publish_date", filter=Q(publish_date__gt=current)),
+            expiry=Min("expiry_date", filter=Q(expiry_date__gt=current)))
+        timeout = settings.PAGE_MENU_CACHE_TIMEOUT
+        for date in upcoming.values():
+            if date is not None:
+                seconds = (date - current).total_seconds()
+                timeout = min(timeout, int(seconds) + 1)
+        return timeout
+
     def with_ascendants_for_slug(self, slug, **kwargs):
         """
         Given a slug, returns a list of pages from ascendants to
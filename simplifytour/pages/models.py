@@ -8,15 +8,15 @@ except ImportError:  # Python 2
     from urlparse import urljoin
 
 from django.urls import resolve, reverse
-from django.db import models
+from django.db import models, transaction
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _, ugettext
 
 from simplifytour.conf import settings
 from simplifytour.core.models import (
-    ContentTyped, Displayable, Orderable, RichText)
+    ContentTyped, Displayable, Hierarchical, Orderable, RichText)
 from simplifytour.pages.fields import MenusField
-from simplifytour.pages.managers import PageManager
+from simplifytour.pages.managers import PageManager, bump_menu_version
 from simplifytour.utils.urls import path_to_slug
 from simplifytour.core.models import wrapped_manager
 
@@ -35,7 +35,7 @@ class BasePage(Orderable, Displayable):
 
 
 @python_2_unicode_compatible
-class Page(BasePage, ContentTyped):
+class Page(BasePage, ContentTyped, Hierarchical):
     """
     A page in the page tree. This is the base class that custom content types
     need to subclass.
@@ -123,9 +123,15 @@ class Page(BasePage, ContentTyped):
                 self._ascendants = pages[0]._ascendants
             else:
                 self._ascendants = []
-        if not self._ascendants:
+        if not self._ascendants and self.has_tree_path():
             # Page has a parent but with_ascendants_for_slug failed to
             # find them due to custom slugs, so retrieve the parents
+            # in a single query via ``tree_path``.
+            ascendants = Page.objects.ancestors(self)
+            self._ascendants = list(ascendants)[::-1]
+        if not self._ascendants:
+            # ``tree_path`` wasn't written, for example after
+            # ``loaddata`` or ``update()``, so retrieve the parents
             # recursively.
             child = self
             while child.parent_id is not None:
@@ -307,3 +313,13 @@ class PageMoveException(Exception):
         return self.msg
 
     __unicode__ = __str__
+
+
+def page_changed(sender, instance, **kwargs):
+    """
+    Invalidate the cached page menu tree once a change to any type of
+    page is committed. Connected for ``Page`` and each of its content
+    models by ``PagesConfig.ready``.
+    """
+    site_id = instance.site_id
+    transaction.on_commit(lambda: bump_menu_version(site_id))
@@ -1,8 +1,6 @@
 from __future__ import unicode_literals
 from future.builtins import str
 
-from collections import defaultdict
-
 from django.core.exceptions import ImproperlyConfigured
 from django.template import TemplateSyntaxError, Variable
 from django.template.loader import get_template
@@ -47,20 +45,20 @@ def page_menu(context, token):
         except KeyError:
             user = None
             slug = ""
-        num_children = lambda id: lambda: len(context["menu_pages"][id])
+        num_children = lambda id: lambda: len(
+            context["menu_pages"].get(id, ()))
         has_children = lambda id: lambda: num_children(id)() > 0
-        rel = [m.__name__.lower()
-               for m in Page.get_content_models()
-               if not m._meta.proxy]
-        published = Page.objects.published(for_user=user).select_related(*rel)
+        # The tree comes from the cache, so each request gets its own
+        # copies of the pages to assign the menu helpers to.
+        pages = Page.objects.menu_tree(for_user=user)
         # Store the current page being viewed in the context. Used
         # for comparisons in page.set_menu_helpers.
         if "page" not in context:
-            try:
-                context.dicts[0]["_current_page"] = published.exclude(
-                    content_model="link").get(slug=slug)
-            except Page.DoesNotExist:
-                context.dicts[0]["_current_page"] = None
+            context.dicts[0]["_current_page"] = None
+            for branch in pages.values():
+                for page in branch:
+                    if page.slug == slug and page.content_model != "link":
+                        context.dicts[0]["_current_page"] = page
         elif slug:
             context.dicts[0]["_current_page"] = context["page"]
         # Some homepage related context flags. on_home is just a helper
@@ -75,15 +73,14 @@ def page_menu(context, token):
         # lookup in setting page.is_current_or_ascendant in
         # page.set_menu_helpers.
         context.dicts[0]["_parent_page_ids"] = {}
-        pages = defaultdict(list)
-        for page in published.order_by("_order"):
-            page.set_helpers(context)
-            context["_parent_page_ids"][page.id] = page.parent_id
-            setattr(page, "num_children", num_children(page.id))
-            setattr(page, "has_children", has_children(page.id))
-            pages[page.parent_id].append(page)
-            if page.slug == home:
-                context.dicts[0]["has_home"] = True
+        for branch in pages.values():
+            for page in branch:
+                page.set_helpers(context)
+                context["_parent_page_ids"][page.id] = page.parent_id
+                setattr(page, "num_children", num_children(page.id))
+                setattr(page, "has_children", has_children(page.id))
+                if page.slug == home:
+                    context.dicts[0]["has_home"] = True
         # Include menu_pages in all contexts, not only in the
         # block being rendered.
         context.dicts[0]["menu_pages"] = pages
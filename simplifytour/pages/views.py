@@ -8,6 +8,7 @@ from django.shortcuts import get_object_or_404
 from django.contrib import messages
 from django.template.response import TemplateResponse
 
+from simplifytour.pages.managers import bump_menu_version
 from simplifytour.pages.models import Page, PageMoveException
 from simplifytour.utils.urls import home_slug
 
@@ -38,11 +39,13 @@ def admin_page_ordering(request):
         # previous siblings.
         page.set_parent(new_parent)
         pages = Page.objects.filter(parent_id=old_parent_id)
-        for i, page in enumerate(pages.order_by('_order')):
-            Page.objects.filter(id=page.id).update(_order=i)
+        Page.reorder(pages.order_by('_order').values_list('id', flat=True))
     # Set the new order for the moved page and its current siblings.
-    for i, page_id in enumerate(request.POST.getlist('siblings[]')):
-        Page.objects.filter(id=get_id(page_id)).update(_order=i)
+    siblings = request.POST.getlist('siblings[]')
+    Page.reorder([get_id(page_id) for page_id in siblings],
+                 parent_id=new_parent_id)
+    # Reordering doesn't send signals, so invalidate the menu here.
+    bump_menu_version(page.site_id)
 
     return HttpResponse("ok")
 
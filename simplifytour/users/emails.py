@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.shortcuts import get_current_site
+from djoser.compat import get_user_email
+
+from simplifytour.utils.importing import import_dotted_path
+from simplifytour.utils.transaction import CommitBatch
+
+
+def email_context(request):
+    """
+    The parts of the ``templated_mail`` context that come from the
+    request, resolved up front so the email can be rendered by a
+    worker without one.
+    """
+    site = get_current_site(request)
+    return {
+        "domain": getattr(settings, "DOMAIN", "") or site.domain,
+        "protocol": "https" if request.is_secure() else "http",
+        "site_name": getattr(settings, "SITE_NAME", "") or site.name,
+    }
+
+
+def email_message(email_class, request, user, to=None):
+    """
+    Describes a ``templated_mail`` email (eg djoser's
+    ``ActivationEmail``) for ``user`` with JSON serializable values,
+    so it can be passed to a task and rendered there.
+    """
+    return {
+        "email_class": "%s.%s" % (email_class.__module__,
+                                  email_class.__name__),
+        "user_id": user.pk,
+        "to": to or [get_user_email(user)],
+        "context": email_context(request),
+    }
+
+
+def queue_email(email_class, request, user, to=None, using=None):
+    """
+    Queues an email for the ``simplifytour.users.tasks.send_emails``
+    task to render and send. Emails queued during a transaction on
+    the ``using`` database are handed to a single task once it
+    commits, so they share one SMTP connection, and none are sent if
+    it rolls back.
+    """
+    EmailBatch.queue(email_message(email_class, request, user, to=to),
+                     using=using)
+
+
+class EmailBatch(CommitBatch):
+    """
+    Messages queued during the current transaction.
+    """
+
+    def process(self, messages):
+        from simplifytour.users.tasks import send_emails
+        send_emails.delay(messages)
+
+
+def render_email(message):
+    """
+    Builds the email described by a message from ``queue_email``,
+    ready to be sent. Returns ``None`` if the user no longer exists.
+    """
+    User = get_user_model()
+    try:
+        user = User.objects.get(pk=message["user_id"])
+    except User.DoesNotExist:
+        return None
+    email_class = import_dotted_path(message["email_class"])
+    context = dict(message["context"], user=user)
+    email = email_class(None, context)
+    email.render()
+    email.to = message["to"]
+    return email
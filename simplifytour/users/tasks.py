@@ -0,0 +1,33 @@
+from smtplib import SMTPException
+
+from django.core.mail import get_connection
+
+from config import celery_app
+
+from simplifytour.users.emails import render_email
+
+
+@celery_app.task(bind=True, max_retries=5, ignore_result=True)
+def send_emails(self, messages):
+    """
+    Renders and sends the messages queued by
+    ``simplifytour.users.emails.queue_email`` over a single SMTP
+    connection. If sending fails, the messages not yet sent are
+    retried with exponential backoff, so delivered ones aren't sent
+    twice. Returns the number of messages sent.
+    """
+    sent = done = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for message in messages:
+            email = render_email(message)
+            if email is not None:
+                sent += connection.send_messages([email])
+            done += 1
+    except (SMTPException, OSError) as e:
+        countdown = 30 * 2 ** self.request.retries
+        raise self.retry(args=[messages[done:]], exc=e, countdown=countdown)
+    finally:
+        connection.close()
+    return sent
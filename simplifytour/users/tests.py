@@ -1,3 +1,104 @@
-from django.test import TestCase
+import asyncore
+import smtpd
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from djoser.email import ActivationEmail, PasswordResetEmail
+
+from simplifytour.users.emails import email_message, queue_email
+from simplifytour.users.tasks import send_emails
+
+
+class SMTPStandIn(smtpd.SMTPServer):
+    """
+    Local SMTP server recording the messages it receives and the
+    number of connections made to it.
+    """
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ("127.0.0.1", 0), None,
+                                  decode_data=True)
+        self.port = self.socket.getsockname()[1]
+        self.connections = 0
+        self.messages = []
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accepted(self, conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        self.messages.append((rcpttos, data))
+
+
+class EmailTaskTests(TransactionTestCase):
+
+    def setUp(self):
+        self.server = SMTPStandIn()
+        self.running = True
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+        settings = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1", EMAIL_PORT=self.server.port,
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Run the task in process rather than through the broker.
+        delay = mock.patch.object(send_emails, "delay", send_emails)
+        delay.start()
+        self.addCleanup(delay.stop)
+        self.request = RequestFactory().post("/graphql")
+        User = get_user_model()
+        self.users = [User.objects.create_user(email="user%s@example.com" % i,
+                                               password="password")
+                      for i in range(3)]
+
+    def tearDown(self):
+        self.running = False
+        self.thread.join()
+        self.server.close()
+
+    def serve(self):
+        while self.running:
+            asyncore.loop(timeout=0.05, count=1)
+
+    def test_batch_uses_one_connection(self):
+        messages = [email_message(ActivationEmail, self.request, user)
+                    for user in self.users]
+        self.assertEqual(send_emails(messages), 3)
+        self.assertEqual(self.server.connections, 1)
+        recipients = [rcpttos for rcpttos, data in self.server.messages]
+        self.assertEqual(recipients, [[user.email] for user in self.users])
+
+    def test_queued_emails_sent_on_commit(self):
+        with transaction.atomic():
+            queue_email(ActivationEmail, self.request, self.users[0])
+            queue_email(PasswordResetEmail, self.request, self.users[1])
+            self.assertEqual(self.server.messages, [])
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_queued_emails_dropped_on_rollback(self):
+        try:
+            with transaction.atomic():
+                queue_email(ActivationEmail, self.request, self.users[0])
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.server.messages, [])
+
+    def test_rolled_back_emails_not_sent_later(self):
+        self.test_queued_emails_dropped_on_rollback()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    queue_email(ActivationEmail, self.request, self.users[1])
+                    raise ValueError
+            except ValueError:
+                pass
+            queue_email(PasswordResetEmail, self.request, self.users[2])
+        recipients = [rcpttos for rcpttos, data in self.server.messages]
+        self.assertEqual(recipients, [[self.users[2].email]])
@@ -0,0 +1,30 @@
+from time import time
+
+from django.core.cache import cache
+
+
+def get_cache_version(key):
+    """
+    Returns the version number stored in the shared cache under the
+    given key, for use in the keys of cached values that depend on
+    it. A missing version (on first use, or after eviction) starts
+    from the current time in milliseconds, so it never matches a
+    version some process has already used.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(key):
+    """
+    Increments the version stored in the shared cache under the given
+    key, so values cached against the previous version are no longer
+    used by any process.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time() * 1000), None)
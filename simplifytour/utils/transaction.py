@@ -0,0 +1,57 @@
+from threading import local
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+_batches = local()
+
+
+class CommitBatch(object):
+    """
+    Items queued during a transaction, handed to ``process`` together
+    once it commits. Each item registers its own ``on_commit``
+    callback, which marks it as committed, and the callback of the
+    last item queued processes the batch. Items whose callbacks are
+    discarded by a rollback are never processed. If the last item was
+    rolled back to a savepoint, the items committed before it are
+    processed when the next item is queued. Outside of a transaction,
+    items are processed as soon as they're queued.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.queued = 0
+        self.committed = []
+
+    @classmethod
+    def queue(cls, item, using=None):
+        """
+        Queues an item in this thread's batch for the ``using``
+        database.
+        """
+        using = using or DEFAULT_DB_ALIAS
+        if not hasattr(_batches, "batches"):
+            _batches.batches = {}
+        batch = _batches.batches.get((cls, using))
+        if batch is None:
+            batch = _batches.batches[(cls, using)] = cls(using)
+        if batch.committed:
+            # Left over from a transaction whose last item was rolled
+            # back to a savepoint.
+            batch.flush()
+        batch.queued += 1
+        number = batch.queued
+        transaction.on_commit(lambda: batch.commit(item, number),
+                              using=using)
+
+    def commit(self, item, number):
+        self.committed.append(item)
+        if number == self.queued:
+            self.flush()
+
+    def flush(self):
+        items, self.committed = self.committed, []
+        self.process(items)
+
+    def process(self, items):
+        raise NotImplementedError()
@@ -2,7 +2,7 @@ import re
 import unicodedata
 
 from django.urls import reverse, resolve, get_script_prefix
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections, router
 from django.utils.encoding import smart_text
 from django.utils import translation
 from django.conf import settings
@@ -65,20 +65,45 @@ def slugify_unicode(s):
 def unique_slug(queryset, slug_field, slug):
     """
     Ensures a slug is unique for the given queryset, appending
-    an integer to its end until the slug is unique.
+    an integer to its end until the slug is unique. Existing slugs
+    that collide are fetched in a single query. On PostgreSQL, a
+    transaction level advisory lock is taken for the slug first, and
+    for any suffixed slug before it's handed out, so that concurrent
+    transactions allocating the same slug wait for each other - the
+    caller should save the object in the same transaction, as
+    ``Slugged.save`` does.
     """
-    i = 0
+    lock_slug(queryset.model, slug, using=queryset.db)
+    prefix = "%s-" % slug
+    taken = set(queryset.filter(**{"%s__startswith" % slug_field: slug})
+                        .values_list(slug_field, flat=True))
+    if slug not in taken:
+        return slug
+    i = 1
     while True:
-        if i > 0:
-            if i > 1:
-                slug = slug.rsplit("-", 1)[0]
-            slug = "%s-%s" % (slug, i)
-        try:
-            queryset.get(**{slug_field: slug})
-        except ObjectDoesNotExist:
-            break
+        candidate = "%s%s" % (prefix, i)
         i += 1
-    return slug
+        if candidate in taken:
+            continue
+        # Another transaction may be saving this slug as its own
+        # unsuffixed slug, so wait for it and check again.
+        lock_slug(queryset.model, candidate, using=queryset.db)
+        if not queryset.filter(**{slug_field: candidate}).exists():
+            return candidate
+
+
+def lock_slug(model, slug, using=None):
+    """
+    Takes a PostgreSQL advisory lock for the given model and slug,
+    held until the current transaction ends. Does nothing outside of
+    a transaction or on other databases.
+    """
+    connection = connections[using or router.db_for_write(model)]
+    if connection.vendor != "postgresql" or not connection.in_atomic_block:
+        return
+    key = "%s:%s" % (model._meta.db_table, slug)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
 
 
 def path_to_slug(path):